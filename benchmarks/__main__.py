@@ -0,0 +1,121 @@
+import argparse
+import json
+import sys
+from typing import Any
+
+from . import load, micro
+from .report import compare, write_results
+
+
+def add_micro_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--repeat", type=int, default=20, help="Timed calls per micro-benchmark.")
+    parser.add_argument("--scale", type=int, default=20, help="Copies of the sample paragraph to segment.")
+    parser.add_argument("--formats", nargs="+", default=["wav", "mp3"], help="pydub export formats.")
+
+
+def add_load_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--url", default=None, help="Benchmark a running app instead of starting one.")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(load.SCENARIOS), default=load.DEFAULT_SCENARIOS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="Requests per concurrency level.")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed requests per scenario.")
+    parser.add_argument("--cached", action="store_true", help="Send identical uploads so caches are hit.")
+    parser.add_argument("--speech-timeout", type=float, default=900.0, help="Seconds to wait for the speech model.")
+    add_upstream_arguments(parser)
+
+
+def add_upstream_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Upstream stand-in base latency.")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="Extra random upstream latency.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of upstream calls that fail.")
+
+
+def run_micro(args: argparse.Namespace) -> dict[str, Any]:
+    return micro.run(repeat=args.repeat, scale=args.scale, formats=args.formats)
+
+
+def run_load(args: argparse.Namespace) -> dict[str, Any]:
+    return load.run(
+        url=args.url,
+        scenarios=args.scenarios,
+        concurrency=args.concurrency,
+        requests=args.requests,
+        warmup=args.warmup,
+        unique=not args.cached,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        speech_timeout=args.speech_timeout,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Offline benchmarks for the speech, transcription and translation services.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, description in [
+        ("micro", "Time text segmentation, pydub export and fingerprinting."),
+        ("load", "Load-test the app against the upstream stand-in."),
+        ("all", "Run the micro-benchmarks, then the load test."),
+    ]:
+        command = commands.add_parser(name, help=description)
+        if name in ("micro", "all"):
+            add_micro_arguments(command)
+        if name in ("load", "all"):
+            add_load_arguments(command)
+        command.add_argument("--output", default="bench_results.json", help='Results file, "-" for stdout.')
+
+    standin = commands.add_parser("standin", help="Serve the upstream stand-in in the foreground.")
+    standin.add_argument("--host", default="127.0.0.1")
+    standin.add_argument("--port", type=int, default=8001)
+    add_upstream_arguments(standin)
+
+    diff = commands.add_parser("compare", help="Compare two results files.")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--threshold", type=float, default=0.1, help="Relative change counted as a regression.")
+
+    args = parser.parse_args()
+
+    if args.command == "standin":
+        import uvicorn
+
+        from .standin import StandIn, create_app
+
+        uvicorn.run(
+            create_app(
+                StandIn(
+                    latency=args.latency_ms / 1000,
+                    jitter=args.jitter_ms / 1000,
+                    error_rate=args.error_rate,
+                )
+            ),
+            host=args.host,
+            port=args.port,
+        )
+        return
+
+    if args.command == "compare":
+        with open(args.old, encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        rows = compare(old, new, threshold=args.threshold)
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"{row['metric']:<70} {row['old']:>12.4g} {row['new']:>12.4g} {row['change']:>+8.1%}{flag}")
+        sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+    results: dict[str, Any] = {}
+    if args.command in ("micro", "all"):
+        results["micro"] = run_micro(args)
+    if args.command in ("load", "all"):
+        results["load"] = run_load(args)
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
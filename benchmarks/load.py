@@ -0,0 +1,349 @@
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from typing import Any, Optional
+
+import httpx
+
+from .micro import load_asset
+from .report import ROOT, summarize
+
+SPEECH_TEXT = (
+    "The quick brown fox jumps over the lazy dog. Prices rose by three percent in "
+    "March, which surprised analysts. Would the committee reconsider its decision?"
+)
+
+
+class Scenario:
+    """
+    One kind of request against the app. Uploads get a random trailer per
+    request unless `unique` is off, so the upload cache and request
+    coalescing do not turn a load test into a cache benchmark.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        *,
+        params: Optional[dict[str, Any]] = None,
+        data: Optional[dict[str, Any]] = None,
+        json: Optional[dict[str, Any]] = None,
+        upload: Optional[str] = None,
+        speech: bool = False,
+    ):
+        self.name = name
+        self.path = path
+        self.params = params
+        self.data = data
+        self.json = json
+        self.upload = upload
+        self.speech = speech
+        self._content: Optional[bytes] = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(name={self.name}, path={self.path})"
+
+    def request(self, *, unique: bool) -> dict[str, Any]:
+        kwargs: dict[str, Any] = {"params": self.params, "data": self.data, "json": self.json}
+        if self.upload is not None:
+            if self._content is None:
+                self._content = load_asset(self.upload)
+            content = self._content + (uuid.uuid4().bytes if unique else b"")
+            kwargs["files"] = {"file": (self.upload, content, "audio/wav")}
+        return kwargs
+
+
+SCENARIOS: dict[str, Scenario] = {
+    s.name: s
+    for s in [
+        Scenario(
+            "transcription",
+            "/v1/audio/transcriptions",
+            params={"language": "es"},
+            data={"response_format": "json"},
+            upload="_es.wav",
+        ),
+        Scenario(
+            "transcription_long",
+            "/v1/audio/transcriptions",
+            params={"language": "es"},
+            data={"response_format": "verbose_json", "long_audio": "true"},
+            upload="_es.wav",
+        ),
+        Scenario(
+            "translation",
+            "/v1/audio/translations",
+            data={"response_format": "json"},
+            upload="_es.wav",
+        ),
+        Scenario(
+            "translation_stream",
+            "/v1/audio/translations/stream",
+            data={"segment_seconds": "10"},
+            upload="_es.wav",
+        ),
+        Scenario(
+            "speech",
+            "/v1/audio/speech",
+            json={"text": SPEECH_TEXT, "language": "en", "response_format": "mp3", "stream": True},
+            speech=True,
+        ),
+        Scenario(
+            "speech_translation",
+            "/v1/audio/speech/translations",
+            data={"language": "en", "response_format": "mp3", "segment_seconds": "10"},
+            upload="_es.wav",
+            speech=True,
+        ),
+    ]
+}
+
+DEFAULT_SCENARIOS = ["transcription", "transcription_long", "translation", "translation_stream"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Server:
+    """A uvicorn process serving `app` on a local port for the duration of a `with` block."""
+
+    def __init__(
+        self,
+        app: str,
+        *,
+        env: Optional[dict[str, str]] = None,
+        port: Optional[int] = None,
+        timeout: float = 60.0,
+    ):
+        self.app = app
+        self.env = env or {}
+        self.port = port or free_port()
+        self.timeout = timeout
+        self.process: Optional[subprocess.Popen] = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(app={self.app}, port={self.port})"
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "Server":
+        self.process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                self.app,
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(self.port),
+                "--log-level",
+                "warning",
+            ],
+            cwd=ROOT,
+            env={**os.environ, **self.env},
+        )
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.app} exited with code {self.process.returncode}")
+            try:
+                # Any response means the server is accepting connections.
+                httpx.get(self.url + "/", timeout=1.0)
+                return self
+            except httpx.TransportError:
+                time.sleep(0.25)
+        self.__exit__(None, None, None)
+        raise TimeoutError(f"{self.app} did not start within {self.timeout}s")
+
+    def __exit__(self, *exc: Any) -> None:
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+async def wait_for_speech(client: httpx.AsyncClient, timeout: float) -> dict[str, Any]:
+    """
+    Wait until the speech model has finished loading or failed, so its
+    start-up work does not overlap the measurements. Returns the readiness body.
+    """
+    deadline = time.monotonic() + timeout
+    body: dict[str, Any] = {}
+    while time.monotonic() < deadline:
+        body = (await client.get("/ready")).json()
+        if body.get("status") in ("ready", "failed"):
+            break
+        await asyncio.sleep(1.0)
+    return body
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    *,
+    concurrency: int,
+    requests: int,
+    unique: bool,
+) -> dict[str, Any]:
+    """
+    Send `requests` requests for `scenario` from `concurrency` workers and
+    report throughput, latency and time to first byte of the body.
+    """
+    latencies: list[float] = []
+    ttfbs: list[float] = []
+    statuses: Counter[str] = Counter()
+    received = 0
+    counter = itertools.count()
+
+    async def worker() -> None:
+        nonlocal received
+        while next(counter) < requests:
+            start = time.perf_counter()
+            ttfb: Optional[float] = None
+            try:
+                async with client.stream(
+                    "POST", scenario.path, **scenario.request(unique=unique)
+                ) as response:
+                    async for chunk in response.aiter_raw():
+                        if ttfb is None:
+                            ttfb = time.perf_counter() - start
+                        received += len(chunk)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = e.__class__.__name__
+            statuses[status] += 1
+            if status.startswith("2"):
+                latencies.append(time.perf_counter() - start)
+                if ttfb is not None:
+                    ttfbs.append(ttfb)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(latencies),
+        "statuses": dict(statuses),
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else None,
+        "latency": summarize(latencies),
+        "ttfb": summarize(ttfbs),
+        "bytes_received": received,
+    }
+
+
+async def run_scenarios(
+    url: str,
+    *,
+    scenarios: list[str],
+    concurrency: list[int],
+    requests: int,
+    warmup: int,
+    unique: bool,
+    speech_timeout: float,
+) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    timeout = httpx.Timeout(600.0, connect=10.0)
+    limits = httpx.Limits(max_connections=max(concurrency), max_keepalive_connections=max(concurrency))
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        readiness = await wait_for_speech(client, speech_timeout)
+        results["speech_status"] = readiness.get("status")
+        for name in scenarios:
+            scenario = SCENARIOS[name]
+            if scenario.speech and readiness.get("status") != "ready":
+                results[name] = {"skipped": f"speech model not ready: {readiness.get('detail') or readiness.get('status')}"}
+                continue
+            if warmup:
+                await run_level(client, scenario, concurrency=1, requests=warmup, unique=unique)
+            results[name] = {
+                "levels": [
+                    await run_level(
+                        client, scenario, concurrency=level, requests=max(requests, level), unique=unique
+                    )
+                    for level in concurrency
+                ]
+            }
+    return results
+
+
+def run(
+    *,
+    url: Optional[str] = None,
+    scenarios: Optional[list[str]] = None,
+    concurrency: Optional[list[int]] = None,
+    requests: int = 32,
+    warmup: int = 2,
+    unique: bool = True,
+    latency_ms: float = 200.0,
+    jitter_ms: float = 50.0,
+    error_rate: float = 0.0,
+    speech_timeout: float = 900.0,
+) -> dict[str, Any]:
+    """
+    Load-test the app at `url`, or start the upstream stand-in and the app
+    wired to it when no `url` is given.
+    """
+    config = {
+        "scenarios": scenarios or DEFAULT_SCENARIOS,
+        "concurrency": concurrency or [1, 4, 16],
+        "requests": requests,
+        "warmup": warmup,
+        "unique": unique,
+        "upstream": {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate}
+        if url is None
+        else None,
+    }
+
+    def scenarios_at(target: str) -> dict[str, Any]:
+        return asyncio.run(
+            run_scenarios(
+                target,
+                scenarios=config["scenarios"],
+                concurrency=config["concurrency"],
+                requests=requests,
+                warmup=warmup,
+                unique=unique,
+                speech_timeout=speech_timeout,
+            )
+        )
+
+    if url is not None:
+        return {"config": {**config, "url": url}, "results": scenarios_at(url)}
+
+    standin_env = {
+        "STANDIN_LATENCY_MS": str(latency_ms),
+        "STANDIN_JITTER_MS": str(jitter_ms),
+        "STANDIN_ERROR_RATE": str(error_rate),
+        "STANDIN_UNIQUE": "true" if unique else "false",
+    }
+    with Server("benchmarks.standin:app", env=standin_env) as standin:
+        app_env = {
+            "OPENAI_BASE_URL": standin.url + "/v1",
+            "OPENAI_API_KEY": "stand-in",
+            "TRANSCRIBE_BACKEND": "openai",
+            # Keep model loading from reaching for the network.
+            "HF_HUB_OFFLINE": "1",
+            "TRANSFORMERS_OFFLINE": "1",
+        }
+        with Server("main:app", env=app_env) as app:
+            results = scenarios_at(app.url)
+        results["upstream"] = httpx.get(standin.url + "/stats").json()
+    return {"config": config, "results": results}
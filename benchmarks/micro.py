@@ -0,0 +1,131 @@
+import io
+import os
+import time
+from typing import Any, Callable, Optional
+
+from pydub import AudioSegment  # type: ignore
+
+from .report import ROOT, summarize
+
+ASSETS = os.path.join(ROOT, "assets")
+
+TEXTS: dict[str, str] = {
+    "en": (
+        "The quick brown fox jumps over the lazy dog. Dr. Smith arrived at 10 a.m. "
+        "and asked, quite politely, whether the meeting had started; nobody answered. "
+        "Prices rose by 3.5% in March, which surprised analysts, investors and, "
+        "frankly, everyone else who had been following the market closely! "
+        "Would the committee reconsider its decision before the end of the quarter? "
+    ),
+    "es": (
+        "El veloz murciélago hindú comía feliz cardillo y kiwi. La Sra. García llegó "
+        "a las 10 de la mañana y preguntó, con mucha cortesía, si la reunión había "
+        "empezado; nadie respondió. ¡Los precios subieron un 3,5 % en marzo, lo que "
+        "sorprendió a los analistas! ¿Reconsiderará el comité su decisión antes de "
+        "que termine el trimestre? "
+    ),
+}
+
+
+def measure(
+    func: Callable[[], Any],
+    *,
+    repeat: int,
+    warmup: int = 1,
+    size: Optional[int] = None,
+) -> dict[str, Any]:
+    """
+    Time `repeat` calls of `func` after `warmup` untimed ones. With `size`
+    (bytes processed per call) the result also reports throughput in MB/s.
+    """
+    for _ in range(warmup):
+        func()
+    timings: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    stats = summarize(timings)
+    result: dict[str, Any] = {
+        "repeat": repeat,
+        "seconds": stats,
+        "ops_per_second": 1 / stats["mean"] if stats["mean"] else None,  # type: ignore
+    }
+    if size is not None and stats["mean"]:
+        result["mb_per_second"] = size / stats["mean"] / 1024 / 1024  # type: ignore
+    return result
+
+
+def load_asset(name: str = "_en.wav") -> bytes:
+    with open(os.path.join(ASSETS, name), "rb") as f:
+        return f.read()
+
+
+def bench_split_text(repeat: int, scale: int) -> dict[str, Any]:
+    """Sentence segmentation and chunk planning, i.e. `XTTS.split_text` and `XTTS.plan_chunks`."""
+    from shared.segment import SentenceSegmenter
+    from speech.planner import ChunkPlanner
+
+    segmenter = SentenceSegmenter()
+    planner = ChunkPlanner.from_env()
+    results: dict[str, Any] = {}
+    for language, paragraph in TEXTS.items():
+        text = paragraph * scale
+        size = len(text.encode("utf-8"))
+        results[f"split_text[{language}]"] = measure(
+            lambda: list(segmenter.split(text=text, language=language)),
+            repeat=repeat,
+            size=size,
+        )
+        sentences = list(segmenter.split(text=text, language=language))
+        results[f"plan_chunks[{language}]"] = measure(
+            lambda: planner.plan(sentences, language=language),
+            repeat=repeat,
+            size=size,
+        )
+    return results
+
+
+def bench_export(repeat: int, formats: list[str]) -> dict[str, Any]:
+    """Decode a WAV with pydub and export it to each of `formats`."""
+    data = load_asset()
+    results: dict[str, Any] = {
+        "pydub_load[wav]": measure(
+            lambda: AudioSegment.from_wav(io.BytesIO(data)), repeat=repeat, size=len(data)
+        )
+    }
+    audio = AudioSegment.from_wav(io.BytesIO(data))
+    for fmt in formats:
+
+        def export() -> bytes:
+            buffer = io.BytesIO()
+            audio.export(buffer, format=fmt)  # type: ignore
+            return buffer.getvalue()
+
+        results[f"pydub_export[{fmt}]"] = measure(export, repeat=repeat, size=len(data))
+    return results
+
+
+def bench_fingerprint(repeat: int) -> dict[str, Any]:
+    """`compute_fingerprint` over the PCM of a sample recording, next to a plain `hash_upload`."""
+    from speech.schema import compute_fingerprint
+    from transcribe.cache import hash_upload
+
+    data = load_asset()
+    pcm = AudioSegment.from_wav(io.BytesIO(data)).raw_data
+    return {
+        "compute_fingerprint": measure(
+            lambda: compute_fingerprint(pcm), repeat=repeat, size=len(pcm)
+        ),
+        "hash_upload": measure(
+            lambda: hash_upload(io.BytesIO(data)), repeat=repeat, size=len(data)
+        ),
+    }
+
+
+def run(*, repeat: int = 20, scale: int = 20, formats: Optional[list[str]] = None) -> dict[str, Any]:
+    return {
+        **bench_split_text(repeat, scale),
+        **bench_export(repeat, formats or ["wav", "mp3"]),
+        **bench_fingerprint(repeat),
+    }
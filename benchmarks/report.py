@@ -0,0 +1,119 @@
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Optional, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of `values`, `q` in [0, 100]."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(values: Sequence[float]) -> dict[str, Optional[float]]:
+    """Distribution of a list of durations in seconds."""
+    if not values:
+        return {"mean": None, "min": None, "p50": None, "p95": None, "p99": None, "max": None}
+    return {
+        "mean": sum(values) / len(values),
+        "min": min(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict[str, Any]:
+    """Where the numbers came from, so runs from different commits can be compared."""
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write_results(path: str, results: dict[str, Any]) -> None:
+    """Write `results` with the run environment as JSON to `path` ("-" for stdout)."""
+    document = {"environment": environment(), **results}
+    text = json.dumps(document, indent=2, ensure_ascii=False)
+    if path == "-":
+        print(text)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text + "\n")
+
+
+def flatten(document: Any, prefix: str = "") -> dict[str, float]:
+    """Numeric leaves of a results document keyed by their dotted path."""
+    if isinstance(document, dict):
+        items = document.items()
+    elif isinstance(document, list):
+        # Load levels are identified by their concurrency rather than position.
+        items = (
+            (f"c{item['concurrency']}" if isinstance(item, dict) and "concurrency" in item else str(i), item)
+            for i, item in enumerate(document)
+        )
+    else:
+        if isinstance(document, (int, float)) and not isinstance(document, bool):
+            return {prefix: float(document)}
+        return {}
+    flat: dict[str, float] = {}
+    for key, value in items:
+        flat.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+# Metrics where a larger number is an improvement; every other compared metric is a duration.
+HIGHER_IS_BETTER = ("throughput_rps", "ops_per_second", "mb_per_second")
+COMPARED = ("p50", "p95", "p99") + HIGHER_IS_BETTER
+
+
+def compare(
+    old: dict[str, Any], new: dict[str, Any], *, threshold: float = 0.1
+) -> list[dict[str, Any]]:
+    """
+    Relative change of every percentile and throughput present in both
+    documents, flagging changes worse than `threshold` as regressions.
+    """
+    before, after = flatten(old), flatten(new)
+    rows = []
+    for path in sorted(before.keys() & after.keys()):
+        metric = path.rsplit(".", 1)[-1]
+        if metric not in COMPARED or not before[path]:
+            continue
+        change = (after[path] - before[path]) / before[path]
+        worse = -change if metric in HIGHER_IS_BETTER else change
+        rows.append(
+            {
+                "metric": path,
+                "old": before[path],
+                "new": after[path],
+                "change": change,
+                "regression": worse > threshold,
+            }
+        )
+    return rows
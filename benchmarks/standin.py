@@ -0,0 +1,174 @@
+import asyncio
+import itertools
+import json
+import os
+import random
+import time
+from typing import Any, Optional
+
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse
+from typing_extensions import Self
+
+from transcribe.formats import render
+
+SENTENCES = [
+    "Hola, esta es una grabación de prueba número {n}.",
+    "El servicio de referencia responde con un texto fijo para la petición {n}.",
+    "Cada frase incluye el número {n} para que la memoria de traducción no acierte.",
+]
+
+
+class StandIn:
+    """
+    Local replacement for the OpenAI-compatible upstream used by the
+    transcription and translation routes.
+
+    Every request waits `latency` seconds plus up to `jitter` more, drawn from
+    a seeded generator so runs are repeatable, and fails with a 503 with
+    probability `error_rate` to exercise the retry path. With `unique` set,
+    transcripts carry the request number so the translation memory and the
+    upload cache see fresh text every time.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.2,
+        jitter: float = 0.05,
+        error_rate: float = 0.0,
+        unique: bool = True,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.unique = unique
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._counter = itertools.count()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(latency={self.latency}, jitter={self.jitter}, error_rate={self.error_rate})"
+
+    @classmethod
+    def from_env(cls) -> Self:
+        return cls(
+            latency=float(os.environ.get("STANDIN_LATENCY_MS", "200")) / 1000,
+            jitter=float(os.environ.get("STANDIN_JITTER_MS", "50")) / 1000,
+            error_rate=float(os.environ.get("STANDIN_ERROR_RATE", "0")),
+            unique=os.environ.get("STANDIN_UNIQUE", "true").lower() in ("1", "true", "yes"),
+            seed=int(os.environ.get("STANDIN_SEED", "0")),
+        )
+
+    async def delay(self) -> Optional[JSONResponse]:
+        """Wait out the simulated latency; returns an error response for failed calls."""
+        self.requests += 1
+        await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            return JSONResponse(
+                {"error": {"message": "Simulated upstream failure", "type": "server_error"}},
+                status_code=503,
+            )
+        return None
+
+    def transcript(self) -> list[str]:
+        n = next(self._counter) if self.unique else 0
+        return [sentence.format(n=n) for sentence in SENTENCES]
+
+    def stats(self) -> dict[str, Any]:
+        return {"requests": self.requests, "errors": self.errors}
+
+
+def translate(text: str) -> str:
+    return f"[translated] {text}"
+
+
+def chat_reply(content: str) -> str:
+    """The JSON a translation prompt expects, for one text or a batch of sentences."""
+    try:
+        items = json.loads(content)
+    except ValueError:
+        items = None
+    if isinstance(items, list):
+        return json.dumps(
+            {
+                "translations": [
+                    {
+                        "id": item["id"],
+                        "translation": translate(item["text"]),
+                        "source_language": "Spanish",
+                    }
+                    for item in items
+                ]
+            },
+            ensure_ascii=False,
+        )
+    return json.dumps(
+        {"translation": translate(content), "source_language": "Spanish"},
+        ensure_ascii=False,
+    )
+
+
+def create_app(standin: StandIn) -> FastAPI:
+    app = FastAPI(title="Upstream stand-in")
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(
+        file: UploadFile = File(...),
+        model: str = Form(default="whisper-large-v3"),
+        language: Optional[str] = Form(default=None),
+        response_format: str = Form(default="json"),
+    ):
+        # Roughly 16 kHz 16-bit mono, close enough for segment timestamps.
+        duration = len(await file.read()) / 32000
+        error = await standin.delay()
+        if error is not None:
+            return error
+        sentences = standin.transcript()
+        step = duration / len(sentences)
+        verbose = {
+            "task": "transcribe",
+            "language": language or "spanish",
+            "duration": duration,
+            "text": " ".join(sentences),
+            "segments": [
+                {"id": i, "start": i * step, "end": (i + 1) * step, "text": text}
+                for i, text in enumerate(sentences)
+            ],
+        }
+        result = render(verbose, response_format)
+        return result if isinstance(result, dict) else PlainTextResponse(result)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        error = await standin.delay()
+        if error is not None:
+            return error
+        content = chat_reply(body["messages"][-1]["content"])
+        return {
+            "id": f"chatcmpl-{standin.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stand-in"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.get("/stats")
+    def stats():
+        return standin.stats()
+
+    return app
+
+
+app = create_app(StandIn.from_env())
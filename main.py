@@ -1,16 +1,42 @@
+import asyncio
 import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 
 load_dotenv()
 
 from pydantic import BaseModel
+from shared.metrics import registry
 from speech.handler import app as speech_app
+from speech.handler import state as speech_state
+from transcribe.clients import clients
 from transcribe.main import app as transcribe_app
 from translations.main import app as translations_app
 
+request_seconds = registry.histogram(
+    "http_request_seconds",
+    "Time until the response starts, by route and status.",
+    ("method", "route", "status"),
+)
+in_flight = 0
+registry.gauge("http_requests_in_flight", "Requests being handled.", lambda: in_flight)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await clients.start()
+    # Load and warm up the speech model without blocking startup.
+    task = asyncio.create_task(speech_state.load())
+    yield
+    task.cancel()
+    speech_state.close()
+    await clients.close()
+
 
 def create_app():
     os.environ["COQUI_TOS_AGREED"] = "true"
@@ -18,6 +44,7 @@ def create_app():
         title="Audio API",
         description="API for audio processing",
         version="0.0.1",
+        lifespan=lifespan,
     )
     app.add_middleware(
         CORSMiddleware,
@@ -28,6 +55,27 @@ def create_app():
     )
     for _ in [speech_app, translations_app, transcribe_app]:
         app.include_router(_, prefix="/v1")
+
+    @app.middleware("http")
+    async def measure(request: Request, call_next):
+        global in_flight
+        in_flight += 1
+        start = time.perf_counter()
+        code = 500
+        try:
+            response = await call_next(request)
+            code = response.status_code
+            return response
+        finally:
+            in_flight -= 1
+            route = request.scope.get("route")
+            request_seconds.observe(
+                time.perf_counter() - start,
+                method=request.method,
+                route=getattr(route, "path", "unmatched"),
+                status=code,
+            )
+
     return app
 
 
@@ -39,6 +87,30 @@ class HealthCheck(BaseModel):
     code: int = 200
 
 
+class ReadinessCheck(BaseModel):
+    status: str
+    code: int
+    detail: Optional[str] = None
+
+
 @app.get("/", response_model=HealthCheck)
 def health_check():
     return HealthCheck()
+
+
+@app.get("/ready", response_model=ReadinessCheck)
+def readiness_check(response: Response):
+    code = (
+        status.HTTP_200_OK
+        if speech_state.ready
+        else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response.status_code = code
+    return ReadinessCheck(status=speech_state.status, code=code, detail=speech_state.error)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(
+        content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+I = TypeVar("I")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[K, I, R]):
+    """
+    Collects items submitted under the same key for up to `max_wait` seconds
+    and passes them to `run(key, items)` together, in batches of at most
+    `max_batch`. `run` returns one result per item, in order.
+
+    Items whose future was cancelled before their batch started are dropped.
+    Items submitted with the same `dedupe` value while pending share one
+    future, so callers that may abandon a shared future should await it
+    through `asyncio.shield`.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[K, list[I]], Awaitable[list[R]]],
+        *,
+        max_batch: int,
+        max_wait: float,
+    ):
+        self.run = run
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._pending: dict[K, dict[Hashable, tuple[I, asyncio.Future[R]]]] = {}
+        self._timers: dict[K, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(max_batch={self.max_batch}, max_wait={self.max_wait})"
+
+    @property
+    def pending(self) -> int:
+        return sum(len(items) for items in self._pending.values())
+
+    def stats(self) -> dict[str, Any]:
+        return {"batches": self.batches, "items": self.items, "pending": self.pending}
+
+    def submit(
+        self, key: K, item: I, *, dedupe: Optional[Hashable] = None
+    ) -> asyncio.Future[R]:
+        pending = self._pending.setdefault(key, {})
+        if dedupe is not None and dedupe in pending:
+            return pending[dedupe][1]
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[R] = loop.create_future()
+        pending[future if dedupe is None else dedupe] = (item, future)
+        if len(pending) >= self.max_batch:
+            self.flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait, self.flush, key)
+        return future
+
+    def flush(self, key: K) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        jobs = [job for job in self._pending.pop(key, {}).values() if not job[1].done()]
+        for i in range(0, len(jobs), self.max_batch):
+            task = asyncio.ensure_future(self._run(key, jobs[i : i + self.max_batch]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: K, jobs: list[tuple[I, asyncio.Future[R]]]) -> None:
+        try:
+            results = await self.run(key, [item for item, _ in jobs])
+        except Exception as e:
+            for _, future in jobs:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.items += len(jobs)
+        for (_, future), result in zip(jobs, results):
+            if not future.done():
+                future.set_result(result)
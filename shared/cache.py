@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import pickle
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import wraps
+from typing import (
+    Any,
+    Awaitable,
+    BinaryIO,
+    Callable,
+    Generic,
+    Hashable,
+    Optional,
+    TypeVar,
+    cast,
+)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class CacheBackend(ABC, Generic[K, V]):
+    """Storage tier of a `Cache`. `get` returns None on a miss."""
+
+    @abstractmethod
+    def get(self, key: K) -> Optional[V]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: K, value: V) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def pop(self, key: K) -> Optional[V]:
+        raise NotImplementedError
+
+    def stats(self) -> dict[str, Any]:
+        return {}
+
+
+class LRUCache(CacheBackend[K, V]):
+    """
+    Thread-safe least-recently-used mapping bounded by the total weight of its
+    values (usually their size in bytes) rather than by entry count, with an
+    optional time-to-live per entry.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_weight: int,
+        weigh: Callable[[V], int] = lambda _: 1,
+        ttl: Optional[float] = None,
+    ):
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self.ttl = ttl
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._data: OrderedDict[K, tuple[V, int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(entries={len(self)}, weight={self.weight}, max_weight={self.max_weight}, ttl={self.ttl})"
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[2] > time.monotonic()
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[2] <= time.monotonic():
+                del self._data[key]
+                self.weight -= entry[1]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: K, value: V) -> None:
+        weight = self.weigh(value)
+        if weight > self.max_weight:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.weight -= previous[1]
+            self._data[key] = (value, weight, expires)
+            self.weight += weight
+            while self.weight > self.max_weight:
+                _, (_, evicted, _) = self._data.popitem(last=False)
+                self.weight -= evicted
+                self.evictions += 1
+
+    def pop(self, key: K) -> Optional[V]:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return None
+            self.weight -= entry[1]
+            return entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self._data),
+            "weight": self.weight,
+            "max_weight": self.max_weight,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class DiskCache(CacheBackend[str, V]):
+    """
+    Directory of serialized values that expire `ttl` seconds after being
+    written. Values are pickled unless `dump`/`load` are given, e.g.
+    `np.save`/`np.load` with `suffix=".npy"` for arrays.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        ttl: float,
+        suffix: str = ".pkl",
+        dump: Callable[[Any, BinaryIO], None] = lambda value, f: pickle.dump(value, f),
+        load: Callable[[BinaryIO], Any] = pickle.load,
+        sweep_every: int = 256,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.suffix = suffix
+        self.dump = dump
+        self.load = load
+        self.sweep_every = sweep_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(directory={self.directory}, ttl={self.ttl})"
+
+    def path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}{self.suffix}")
+
+    def _expired(self, path: str) -> bool:
+        return time.time() - os.path.getmtime(path) > self.ttl
+
+    def get(self, key: str) -> Optional[V]:
+        path = self.path(key)
+        try:
+            if self._expired(path):
+                os.remove(path)
+                self.evictions += 1
+                raise FileNotFoundError(path)
+            with open(path, "rb") as f:
+                value = self.load(f)
+        except (FileNotFoundError, ValueError, OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: V) -> None:
+        path = self.path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            self.dump(value, f)
+        os.replace(tmp, path)
+        self._writes += 1
+        if self._writes % self.sweep_every == 0:
+            self.sweep()
+
+    def pop(self, key: str) -> Optional[V]:
+        value = self.get(key)
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+        return value
+
+    def sweep(self) -> None:
+        """Remove every expired entry."""
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith(self.suffix) and self._expired(path):
+                    os.remove(path)
+                    self.evictions += 1
+            except FileNotFoundError:
+                continue
+
+    def stats(self) -> dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class Cache(Generic[K, V]):
+    """
+    Two-tier cache: an in-memory `LRUCache` in front of an optional slower
+    backend (disk, SQLite, ...). Backend hits are promoted to memory.
+
+    `get_or_compute` and `aget_or_compute` coalesce concurrent misses for the
+    same key, from threads and from coroutines respectively, so the value is
+    computed once while other callers wait for it. An async computation is
+    cancelled once every caller waiting for it has been cancelled. Failed
+    computations are not cached, and None is never stored.
+    """
+
+    def __init__(
+        self, memory: LRUCache[K, V], backend: Optional[CacheBackend[K, V]] = None
+    ):
+        self.memory = memory
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._flights: dict[K, _Flight] = {}
+        self._tasks: dict[K, asyncio.Task[V]] = {}
+        self._waiters: dict[asyncio.Task[V], int] = {}
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(memory={self.memory!r}, backend={self.backend!r})"
+
+    def get(self, key: K) -> Optional[V]:
+        value = self.memory.get(key)
+        if value is None and self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        self.memory.set(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def pop(self, key: K) -> Optional[V]:
+        value = self.memory.pop(key)
+        if self.backend is not None:
+            stored = self.backend.pop(key)
+            value = value if value is not None else stored
+        return value
+
+    async def aget(self, key: K) -> Optional[V]:
+        if self.backend is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: K, value: V) -> None:
+        if self.backend is None:
+            self.set(key, value)
+        else:
+            await asyncio.to_thread(self.set, key, value)
+
+    def get_or_compute(self, key: K, compute: Callable[[], V]) -> V:
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self.coalesced += 1
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return cast(V, flight.value)
+        try:
+            flight.value = value = compute()
+            if value is not None:
+                self.set(key, value)
+            return value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    async def aget_or_compute(
+        self, key: K, compute: Callable[[], Awaitable[V]]
+    ) -> V:
+        value = await self.aget(key)
+        if value is not None:
+            return value
+        task = self._tasks.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+
+            async def run() -> V:
+                value = await compute()
+                if value is not None:
+                    await self.aset(key, value)
+                return value
+
+            task = asyncio.ensure_future(run())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        # Shield so one caller going away does not cancel the shared
+        # computation, but cancel it once the last caller has gone.
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # Later callers start a fresh computation instead of
+                    # joining one that is being cancelled.
+                    self._forget(key, task)
+                    task.cancel()
+
+    def _forget(self, key: K, task: asyncio.Task[V]) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def stats(self) -> dict[str, Any]:
+        stats: dict[str, Any] = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights) + len(self._tasks),
+            "memory": self.memory.stats(),
+        }
+        if self.backend is not None:
+            stats["backend"] = self.backend.stats()
+        return stats
+
+
+def call_key(func: Callable[..., Any], *args: Any, **kwargs: Any) -> str:
+    return repr((func.__module__, func.__qualname__, args, sorted(kwargs.items())))
+
+
+def cached(
+    cache: Cache[str, Any], key: Callable[..., str] = call_key
+) -> Callable[[F], F]:
+    """
+    Memoize a sync or async function in `cache`. Async functions are awaited
+    before their result is stored, and concurrent calls with the same
+    arguments share one computation.
+    """
+
+    def decorator(func: F) -> F:
+        if asyncio.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def awrapper(*args: Any, **kwargs: Any) -> Any:
+                return await cache.aget_or_compute(
+                    key(func, *args, **kwargs), lambda: func(*args, **kwargs)
+                )
+
+            awrapper.cache = cache  # type: ignore
+            return cast(F, awrapper)
+
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return cache.get_or_compute(
+                key(func, *args, **kwargs), lambda: func(*args, **kwargs)
+            )
+
+        wrapper.cache = cache  # type: ignore
+        return cast(F, wrapper)
+
+    return decorator
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Union
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RATIO_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base of the metric families rendered by `Registry`."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(name={self.name}, labels={self.labelnames})"
+
+    def _key(self, labels: dict[str, object]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Gauge(Metric):
+    """
+    Values read from `collect` at scrape time, for state that already lives
+    in `stats()` dicts. Use `kind="counter"` for monotonically increasing
+    totals such as cache hits.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Union[float, dict[tuple[str, ...], float], None]],
+        labelnames: tuple[str, ...] = (),
+        kind: str = "gauge",
+    ):
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        values = self.collect()
+        if values is None:
+            return
+        if not isinstance(values, dict):
+            values = {(): float(values)}
+        for key, value in values.items():
+            yield self.name, dict(zip(self.labelnames, key)), float(value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            values = {k: (list(c), t[0]) for k, (c, t) in self._values.items()}
+        for key, (counts, total) in values.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    {**labels, "le": _format_value(bound)},
+                    cumulative,
+                )
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    """
+    Process-wide metric families rendered in the Prometheus text format.
+
+    Families are created once by name; asking again for an existing name
+    returns the registered instance, so modules can declare their metrics at
+    import time without coordinating.
+    """
+
+    def __init__(self, namespace: str = "audio"):
+        self.namespace = namespace
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(namespace={self.namespace}, metrics={len(self._metrics)})"
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", help, labelnames))  # type: ignore
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(  # type: ignore
+            Histogram(f"{self.namespace}_{name}", help, labelnames, buckets)
+        )
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Union[float, dict[tuple[str, ...], float], None]],
+        labelnames: tuple[str, ...] = (),
+        kind: str = "gauge",
+    ) -> Gauge:
+        return self._register(  # type: ignore
+            Gauge(f"{self.namespace}_{name}", help, collect, labelnames, kind)
+        )
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def cache_counts(stats: Optional[dict[str, object]]) -> dict[tuple[str, ...], float]:
+    """Hit/miss/coalesced counts of a `Cache.stats()` dict, labelled by result."""
+    if not stats:
+        return {}
+    return {
+        (result,): float(stats.get(key, 0))  # type: ignore
+        for result, key in (("hit", "hits"), ("miss", "misses"), ("coalesced", "coalesced"))
+    }
+
+
+registry = Registry()
@@ -0,0 +1,74 @@
+import threading
+from typing import Iterator, Optional
+
+import spacy
+from spacy.language import Language
+
+# Whisper reports the detected language by name in verbose_json results.
+WHISPER_LANGUAGES: dict[str, str] = {
+    "arabic": "ar",
+    "chinese": "zh",
+    "czech": "cs",
+    "dutch": "nl",
+    "english": "en",
+    "french": "fr",
+    "german": "de",
+    "hindi": "hi",
+    "hungarian": "hu",
+    "italian": "it",
+    "japanese": "ja",
+    "korean": "ko",
+    "polish": "pl",
+    "portuguese": "pt",
+    "russian": "ru",
+    "spanish": "es",
+    "turkish": "tr",
+}
+
+
+def language_code(language: Optional[str]) -> str:
+    """ISO code for a language code or Whisper language name; "xx" if unknown."""
+    if not language:
+        return "xx"
+    language = language.lower()
+    return WHISPER_LANGUAGES.get(language, language)
+
+
+class SentenceSegmenter:
+    """
+    Rule-based sentence splitter for every `SpeakerLanguage`, also used by
+    the translation memory.
+
+    Each language gets a blank spaCy pipeline (tokenizer only) plus the
+    punctuation-based `sentencizer`, built lazily on first use. No tagger,
+    parser or NER is loaded, and no model packages need to be installed.
+    """
+
+    def __init__(self):
+        self._pipelines: dict[str, Language] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(languages={sorted(self._pipelines)})"
+
+    def pipeline(self, language: str) -> Language:
+        nlp = self._pipelines.get(language)
+        if nlp is not None:
+            return nlp
+        with self._lock:
+            nlp = self._pipelines.get(language)
+            if nlp is None:
+                try:
+                    nlp = spacy.blank(language)
+                except (ImportError, KeyError):
+                    # Multi-language tokenizer for anything spaCy has no class for.
+                    nlp = spacy.blank("xx")
+                nlp.add_pipe("sentencizer")
+                self._pipelines[language] = nlp
+        return nlp
+
+    def split(self, *, text: str, language: str) -> Iterator[str]:
+        for sent in self.pipeline(language)(text).sents:
+            sentence = sent.text.strip()
+            if sentence:
+                yield sentence
@@ -0,0 +1,73 @@
+import os
+import unicodedata
+from typing import Optional
+
+import numpy as np
+from typing_extensions import Self
+
+from shared.cache import Cache, DiskCache, LRUCache
+
+
+def normalize_sentence(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class SentenceCache(Cache[str, np.ndarray]):
+    """
+    Cache of synthesized sentence waveforms keyed by normalized text, speaker,
+    language and speed. A byte-bounded in-memory LRU sits in front of an
+    optional on-disk tier of .npy files with TTL eviction.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int,
+        directory: Optional[str] = None,
+        ttl: float = 3600 * 24 * 7,
+    ):
+        super().__init__(
+            LRUCache(max_weight=max_bytes, weigh=lambda wav: wav.nbytes),
+            DiskCache(
+                directory,
+                ttl=ttl,
+                suffix=".npy",
+                dump=lambda wav, f: np.save(f, wav),
+                load=np.load,
+            )
+            if directory
+            else None,
+        )
+
+    @classmethod
+    def from_env(cls) -> Self:
+        return cls(
+            max_bytes=int(os.environ.get("XTTS_SENTENCE_CACHE_MB", "128")) * 1024 * 1024,
+            directory=os.environ.get("XTTS_SENTENCE_CACHE_DIR") or None,
+            ttl=float(os.environ.get("XTTS_SENTENCE_CACHE_TTL", str(3600 * 24 * 7))),
+        )
+
+    def __contains__(self, key: str) -> bool:
+        """Whether `key` is stored, without counting a lookup."""
+        if key in self.memory:
+            return True
+        return isinstance(self.backend, DiskCache) and os.path.exists(
+            self.backend.path(key)
+        )
+
+    @staticmethod
+    def key(
+        *,
+        text: str,
+        speaker: str,
+        language: str,
+        speed: float,
+        generation: Optional[float] = None,
+    ) -> str:
+        """
+        `generation` distinguishes registrations of a custom voice, so
+        entries synthesized for a deleted voice are never served again.
+        """
+        if generation is not None:
+            speaker = f"{speaker}@{generation:.6f}"
+        return f"{language}|{speaker}|{speed:.3f}|{normalize_sentence(text)}"
@@ -0,0 +1,151 @@
+import asyncio
+import struct
+from typing import AsyncGenerator, Optional
+
+import numpy as np
+from pydub import AudioSegment  # type: ignore
+
+from .schema import AudioFormat
+
+CHUNK_SIZE = 4096
+
+# Container arguments for ffmpeg; wav is written natively without a subprocess.
+FFMPEG_FORMATS: dict[str, list[str]] = {
+    "mp3": ["-f", "mp3"],
+    "ogg": ["-f", "ogg"],
+    "flac": ["-f", "flac"],
+}
+
+
+def to_pcm16(wav: np.ndarray) -> bytes:
+    """Convert a float waveform in [-1, 1] to little-endian 16-bit PCM."""
+    return (np.clip(wav, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def wav_header(*, sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    """RIFF header for a WAV stream of unknown length."""
+    unknown = 0xFFFFFFFF
+    byte_rate = sample_rate * channels * sample_width
+    return (
+        b"RIFF"
+        + struct.pack("<I", unknown)
+        + b"WAVEfmt "
+        + struct.pack(
+            "<IHHIIHH",
+            16,
+            1,
+            channels,
+            sample_rate,
+            byte_rate,
+            channels * sample_width,
+            sample_width * 8,
+        )
+        + b"data"
+        + struct.pack("<I", unknown)
+    )
+
+
+class StreamEncoder:
+    """
+    Encoder that stays open for a whole speech request.
+
+    PCM frames are written incrementally and come out as one continuous
+    container stream, instead of one independently encoded file per sentence.
+    Compressed formats are piped through a single ffmpeg process; wav is
+    emitted directly as a header followed by raw PCM.
+    """
+
+    def __init__(self, *, response_format: AudioFormat, sample_rate: int):
+        self.response_format = response_format
+        self.sample_rate = sample_rate
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self._output: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue()
+        self._pump: Optional[asyncio.Task[None]] = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(format={self.response_format}, sample_rate={self.sample_rate})"
+
+    async def open(self) -> None:
+        if self.response_format == "wav":
+            self._emit(wav_header(sample_rate=self.sample_rate))
+            return
+        self.process = await asyncio.create_subprocess_exec(
+            AudioSegment.converter,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-f",
+            "s16le",
+            "-ar",
+            str(self.sample_rate),
+            "-ac",
+            "1",
+            "-i",
+            "pipe:0",
+            "-flush_packets",
+            "1",
+            *FFMPEG_FORMATS[self.response_format],
+            "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        self._pump = asyncio.ensure_future(self._read_stdout())
+
+    async def _read_stdout(self) -> None:
+        assert self.process is not None and self.process.stdout is not None
+        while True:
+            data = await self.process.stdout.read(CHUNK_SIZE)
+            if not data:
+                break
+            self._output.put_nowait(data)
+        self._output.put_nowait(None)
+
+    def _emit(self, data: bytes) -> None:
+        for i in range(0, len(data), CHUNK_SIZE):
+            self._output.put_nowait(data[i : i + CHUNK_SIZE])
+
+    async def write(self, wav: np.ndarray) -> None:
+        pcm = to_pcm16(wav)
+        if self.process is None:
+            self._emit(pcm)
+            return
+        assert self.process.stdin is not None
+        self.process.stdin.write(pcm)
+        await self.process.stdin.drain()
+
+    def ready(self) -> list[bytes]:
+        """Encoded bytes available right now, without waiting."""
+        chunks: list[bytes] = []
+        while not self._output.empty():
+            chunk = self._output.get_nowait()
+            if chunk is None:
+                # Keep the end-of-stream marker for finish().
+                self._output.put_nowait(None)
+                break
+            chunks.append(chunk)
+        return chunks
+
+    async def finish(self) -> AsyncGenerator[bytes, None]:
+        """Flush the encoder and yield the remaining bytes."""
+        if self.process is None:
+            for chunk in self.ready():
+                yield chunk
+            return
+        assert self.process.stdin is not None and self.process.stderr is not None
+        self.process.stdin.close()
+        while True:
+            chunk = await self._output.get()
+            if chunk is None:
+                break
+            yield chunk
+        if await self.process.wait() != 0:
+            error = (await self.process.stderr.read()).decode(errors="replace")
+            raise RuntimeError(f"ffmpeg failed to encode {self.response_format}: {error}")
+
+    async def aclose(self) -> None:
+        if self.process is not None and self.process.returncode is None:
+            self.process.kill()
+            await self.process.wait()
+        if self._pump is not None and not self._pump.done():
+            self._pump.cancel()
@@ -1,12 +1,293 @@
-from fastapi import APIRouter
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, Literal, Optional
 
-from .schema import CreateSpeechRequest
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    UploadFile,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from shared.metrics import cache_counts, registry
+from transcribe.longform import load_audio, plan_segments
+from translations.main import translate_segments
+
+from .schema import (
+    AudioFormat,
+    CreateSpeechRequest,
+    SpeakerLanguage,
+    SpeakerName,
+    VoiceInfo,
+    VoiceObject,
+    get_speaker,
+    language_names,
+)
 from .service import XTTS
 
+logger = logging.getLogger(__name__)
+
 app = APIRouter(prefix="/audio")
-xtts = XTTS.from_pretrained()
+
+
+class ModelState:
+    """Loads and warms up the XTTS model in the background."""
+
+    def __init__(self):
+        self.xtts: Optional[XTTS] = None
+        self.status: Literal["loading", "warming", "ready", "failed"] = "loading"
+        self.error: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(status={self.status})"
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    async def load(self) -> None:
+        replicas = int(os.environ.get("XTTS_REPLICAS", "0"))
+        threads = os.environ.get("XTTS_REPLICA_THREADS")
+        try:
+            xtts = await asyncio.to_thread(XTTS.from_pretrained)
+            if replicas:
+                xtts.start_replicas(replicas, threads=int(threads) if threads else None)
+            self.status = "warming"
+            await xtts.pool.broadcast(xtts.warmup)
+        except Exception as e:
+            logger.exception("Failed to load XTTS")
+            self.status = "failed"
+            self.error = f"{e.__class__.__name__}: {e}"
+            return
+        self.xtts = xtts
+        self.status = "ready"
+
+    def close(self) -> None:
+        if self.xtts is not None:
+            self.xtts.pool.shutdown()
+
+
+state = ModelState()
+
+
+def _xtts_stat(*path: str) -> Optional[float]:
+    if state.xtts is None:
+        return None
+    value = state.xtts.stats()
+    for key in path:
+        value = value[key]
+    return float(value)
+
+
+def _xtts_cache(name: str) -> dict[tuple[str, ...], float]:
+    return cache_counts(state.xtts.stats()[name] if state.xtts is not None else None)
+
+
+registry.gauge(
+    "speech_model_ready", "1 once the speech model is loaded and warm.", lambda: float(state.ready)
+)
+registry.gauge(
+    "speech_queued", "Inference jobs admitted and not yet finished.", lambda: _xtts_stat("pool", "queued")
+)
+registry.gauge(
+    "speech_in_flight", "Inference jobs running on a worker.", lambda: _xtts_stat("pool", "in_flight")
+)
+registry.gauge(
+    "speech_sentence_cache_requests_total",
+    "Sentence waveform cache lookups by result.",
+    lambda: _xtts_cache("sentences"),
+    ("result",),
+    kind="counter",
+)
+registry.gauge(
+    "speech_latent_cache_requests_total",
+    "Speaker conditioning cache lookups by result.",
+    lambda: _xtts_cache("latents"),
+    ("result",),
+    kind="counter",
+)
+
+
+def get_xtts() -> XTTS:
+    if state.xtts is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Speech model is {state.status}",
+            headers={"Retry-After": "5"},
+        )
+    return state.xtts
 
 
 @app.post("/speech")
-def speech_handler(body: CreateSpeechRequest):
+def speech_handler(body: CreateSpeechRequest, xtts: XTTS = Depends(get_xtts)):
     return xtts.handler(body=body)
+
+
+@app.get("/speech/stats")
+def speech_stats(xtts: XTTS = Depends(get_xtts)):
+    return xtts.stats()
+
+
+@app.post("/speech/translations")
+async def speech_translation_handler(
+    file: UploadFile = File(..., description="Audio file to translate"),
+    language: SpeakerLanguage = Form(
+        default="en", description="The language to translate into and speak."
+    ),
+    voice: Optional[SpeakerName] = Form(
+        default=None, description="The voice to use for the speech."
+    ),
+    voice_id: Optional[str] = Form(
+        default=None, description="The custom voice to use for the speech."
+    ),
+    response_format: AudioFormat = Form(
+        default="mp3", description="The desired format for the speech output."
+    ),
+    speed: float = Form(default=1.0, ge=0.25, le=4.0),
+    segment_seconds: float = Form(
+        default=15.0,
+        ge=5.0,
+        le=300.0,
+        description="Maximum source segment length, split at silences.",
+    ),
+    xtts: XTTS = Depends(get_xtts),
+):
+    """
+    Translate speech into `language` and speak it, in one streamed response.
+
+    Source segments are transcribed and translated concurrently, and each
+    translated segment is planned into chunks and synthesized as soon as it
+    is ready, so audio for the first segment streams while later segments
+    are still being translated.
+    """
+    xtts.pool.check_capacity()
+    if not file.content_type or not file.content_type.startswith(("audio/", "video/")):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be an audio file",
+        )
+    speaker = voice_id or voice or get_speaker()
+    # Fail before the response starts rather than with a truncated body.
+    if not await asyncio.to_thread(xtts.voice_exists, speaker):
+        await file.close()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Voice {speaker} not found"
+        )
+    try:
+        # Decode up front: the upload is closed once the response starts.
+        audio = await asyncio.to_thread(load_audio, file.file)
+        spans = await asyncio.to_thread(
+            plan_segments, audio, max_seconds=segment_seconds
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Could not decode audio: {e}",
+        ) from e
+    finally:
+        await file.close()
+
+    async def chunks() -> AsyncIterator[str]:
+        async for segment in translate_segments(
+            audio,
+            spans,
+            "whisper-large-v3",
+            None,
+            0.0,
+            int(os.environ.get("TRANSCRIBE_MAX_PARALLEL", "4")),
+            target=language_names[language],
+        ):
+            if not segment.content:
+                continue
+            for chunk in await asyncio.to_thread(
+                xtts.plan_chunks,
+                text=segment.content,
+                language=language,
+                speaker=speaker,
+                speed=speed,
+            ):
+                yield chunk
+
+    return StreamingResponse(
+        xtts.stream_audio(
+            text="",
+            chunks=chunks(),
+            speaker=speaker,
+            language=language,
+            speed=speed,
+            response_format=response_format,
+        ),
+        media_type=f"audio/{response_format}",
+        headers={
+            "Content-Disposition": f"attachment; filename=speech.{response_format}",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Segment-Count": str(len(spans)),
+        },
+    )
+
+
+@app.post("/voices", response_model=VoiceInfo, status_code=status.HTTP_201_CREATED)
+async def create_voice(
+    voice: VoiceObject = Depends(VoiceObject.from_upload),
+    xtts: XTTS = Depends(get_xtts),
+):
+    xtts.pool.check_capacity()
+    existing = await asyncio.to_thread(xtts.voices.get, voice.fingerprint)
+    if existing is None:
+        staging = await asyncio.to_thread(xtts.voices.stage, voice)
+        try:
+            latents = await xtts.pool.run(
+                xtts.register_voice,
+                voice.fingerprint,
+                os.path.join(staging, "reference.wav"),
+            )
+            info = await asyncio.to_thread(xtts.voices.save, voice, latents, staging)
+        finally:
+            await asyncio.to_thread(xtts.voices.discard, staging)
+        if info.user == voice.user:
+            # Replicas keep their own latent caches; warm every one of them.
+            await xtts.pool.broadcast(xtts.cache_voice, voice.fingerprint, latents)
+            return info
+        existing = info
+    if existing.user != voice.user:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This recording is already registered by another user",
+        )
+    return existing
+
+
+@app.get("/voices", response_model=list[VoiceInfo])
+async def list_voices(user: str = Query(...), xtts: XTTS = Depends(get_xtts)):
+    return await asyncio.to_thread(xtts.voices.list_voices, user=user)
+
+
+@app.delete("/voices/{voice_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_voice(
+    voice_id: str, user: str = Query(...), xtts: XTTS = Depends(get_xtts)
+):
+    try:
+        existing = await asyncio.to_thread(xtts.voices.get, voice_id)
+    except ValueError:
+        existing = None
+    if existing is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Voice {voice_id} not found"
+        )
+    if existing.user != user:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Voice {voice_id} belongs to another user",
+        )
+    await asyncio.to_thread(xtts.voices.delete, voice_id)
+    xtts.forget_voice(voice_id)
+    # Replicas keep their own latent caches; evict it from every one of them.
+    await xtts.pool.broadcast(xtts.forget_voice, voice_id)
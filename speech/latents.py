@@ -0,0 +1,52 @@
+import os
+from typing import Any, Callable
+
+import torch
+from typing_extensions import Self, TypeAlias
+
+from shared.cache import Cache, LRUCache
+
+Latents: TypeAlias = "tuple[torch.Tensor, torch.Tensor]"
+
+
+def latents_size(latents: Latents) -> int:
+    return sum(t.element_size() * t.nelement() for t in latents)
+
+
+class SpeakerLatentCache:
+    """
+    Cache of XTTS speaker conditioning, i.e. the GPT conditioning latent and
+    the speaker embedding, keyed by built-in voice name or voice fingerprint.
+
+    Entries live in a memory-bounded LRU on the model device, and concurrent
+    misses for the same speaker compute its conditioning once. Nothing is
+    persisted here: built-in speakers ship with the model and custom voices
+    are stored with their latents by `VoiceStore`, which a restarted service
+    loads from.
+    """
+
+    def __init__(self, *, max_bytes: int):
+        self.cache: Cache[str, Latents] = Cache(
+            LRUCache(max_weight=max_bytes, weigh=latents_size)
+        )
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(cache={self.cache!r})"
+
+    @classmethod
+    def from_env(cls) -> Self:
+        return cls(
+            max_bytes=int(os.environ.get("XTTS_LATENT_CACHE_MB", "256")) * 1024 * 1024,
+        )
+
+    def put(self, key: str, latents: Latents) -> None:
+        self.cache.set(key, latents)
+
+    def get(self, key: str, compute: Callable[[], Latents]) -> Latents:
+        return self.cache.get_or_compute(key, compute)
+
+    def delete(self, key: str) -> None:
+        self.cache.pop(key)
+
+    def stats(self) -> dict[str, Any]:
+        return self.cache.stats()
@@ -0,0 +1,232 @@
+import argparse
+import copy
+import json
+import os
+import time
+from typing import Any, Literal, Optional, get_args
+
+import numpy as np
+import torch
+from torch import nn
+from typing_extensions import Self, TypeAlias
+
+ProfileName: TypeAlias = Literal["fp32", "int8"]
+
+QUALITY_TEXTS = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Please hold while we transfer your call to the next available agent.",
+]
+
+
+def conv1d_to_linear(module: nn.Module) -> int:
+    """
+    Replace HF GPT-2 style `Conv1D` layers with equivalent `nn.Linear` layers,
+    so dynamic quantization (which only targets `nn.Linear`) reaches the
+    attention and MLP projections of the XTTS GPT.
+    """
+    replaced = 0
+    for name, child in module.named_children():
+        if child.__class__.__name__ == "Conv1D" and hasattr(child, "nf"):
+            in_features, out_features = child.weight.shape
+            linear = nn.Linear(in_features, out_features, bias=child.bias is not None)
+            linear.weight = nn.Parameter(child.weight.detach().t().contiguous())
+            if child.bias is not None:
+                linear.bias = nn.Parameter(child.bias.detach().clone())
+            setattr(module, name, linear)
+            replaced += 1
+        else:
+            replaced += conv1d_to_linear(child)
+    return replaced
+
+
+class InferenceProfile:
+    """
+    CPU inference settings for the XTTS GPT and vocoder.
+
+    `int8` applies dynamic int8 quantization to their linear layers, `compile`
+    wraps them with `torch.compile`, and the thread counts configure torch's
+    intra- and inter-op pools. Inference itself always runs under
+    `torch.inference_mode`.
+    """
+
+    def __init__(
+        self,
+        *,
+        name: ProfileName = "fp32",
+        compile: bool = False,
+        threads: Optional[int] = None,
+        interop_threads: Optional[int] = None,
+    ):
+        if name not in get_args(ProfileName):
+            raise ValueError(
+                f"Unknown inference profile {name!r}, expected one of {get_args(ProfileName)}"
+            )
+        self.name = name
+        self.compile = compile
+        self.threads = threads
+        self.interop_threads = interop_threads
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(name={self.name}, compile={self.compile}, threads={self.threads}, interop_threads={self.interop_threads})"
+
+    @classmethod
+    def from_env(cls) -> Self:
+        threads = os.environ.get("XTTS_THREADS")
+        interop_threads = os.environ.get("XTTS_INTEROP_THREADS")
+        return cls(
+            name=os.environ.get("XTTS_PROFILE", "fp32"),  # type: ignore
+            compile=os.environ.get("XTTS_COMPILE", "").lower() in ("1", "true", "yes"),
+            threads=int(threads) if threads else None,
+            interop_threads=int(interop_threads) if interop_threads else None,
+        )
+
+    def apply_threads(self) -> None:
+        """Configure torch's thread pools; process-wide, unlike the rest of `apply`."""
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        if self.interop_threads:
+            try:
+                torch.set_num_interop_threads(self.interop_threads)
+            except RuntimeError:
+                # Only settable before the first inter-op parallel work.
+                pass
+
+    def apply(self, model: Any, *, device: torch.device) -> None:
+        """Apply the profile in place to an XTTS model (`synthesizer.tts_model`)."""
+        self.apply_threads()
+        if self.name == "int8":
+            if device.type != "cpu":
+                raise ValueError("int8 dynamic quantization is only supported on CPU")
+            conv1d_to_linear(model.gpt)
+            for part in ("gpt", "hifigan_decoder"):
+                torch.ao.quantization.quantize_dynamic(
+                    getattr(model, part), {nn.Linear}, dtype=torch.qint8, inplace=True
+                )
+        if self.compile and hasattr(torch, "compile"):
+            gpt = torch.compile(model.gpt.gpt, dynamic=True)
+            model.gpt.gpt = gpt
+            # Autoregressive decoding runs through gpt_inference, which holds
+            # its own reference to the GPT-2 stack.
+            if getattr(model.gpt, "gpt_inference", None) is not None:
+                model.gpt.gpt_inference.transformer = gpt
+            model.hifigan_decoder = torch.compile(model.hifigan_decoder, dynamic=True)
+
+
+def _log_spectrogram(wav: np.ndarray, n_fft: int = 1024, hop: int = 256) -> np.ndarray:
+    window = np.hanning(n_fft)
+    frames = [
+        np.abs(np.fft.rfft(wav[i : i + n_fft] * window))
+        for i in range(0, max(len(wav) - n_fft, 0) + 1, hop)
+    ]
+    return 20 * np.log10(np.maximum(np.array(frames), 1e-5))
+
+
+def spectral_distance(reference: np.ndarray, candidate: np.ndarray) -> float:
+    """Mean absolute log-spectrogram difference in dB over the common length."""
+    length = min(len(reference), len(candidate))
+    return float(
+        np.mean(
+            np.abs(
+                _log_spectrogram(reference[:length]) - _log_spectrogram(candidate[:length])
+            )
+        )
+    )
+
+
+def _synthesize(
+    model: Any, latents: Any, *, texts: list[str], language: str, sample_rate: int
+) -> tuple[list[np.ndarray], float]:
+    gpt_cond_latent, speaker_embedding = latents
+    wavs: list[np.ndarray] = []
+    compute = 0.0
+    with torch.inference_mode():
+        for text in texts:
+            start = time.perf_counter()
+            out = model.inference(
+                text, language, gpt_cond_latent, speaker_embedding, do_sample=False
+            )
+            compute += time.perf_counter() - start
+            wav = out["wav"]
+            if isinstance(wav, torch.Tensor):
+                wav = wav.cpu().numpy()
+            wavs.append(np.asarray(wav, dtype=np.float32).squeeze())
+    audio = sum(len(wav) for wav in wavs) / sample_rate
+    return wavs, audio / compute if compute else 0.0
+
+
+def quality_check(
+    xtts: Any,
+    profile: InferenceProfile,
+    *,
+    texts: Optional[list[str]] = None,
+    speaker: Optional[str] = None,
+    language: str = "en",
+) -> dict[str, Any]:
+    """
+    Compare `profile` against the fp32 eager baseline on the same model.
+
+    Both runs use greedy decoding so differences come from numerics, not
+    sampling, and the profile's thread counts, which are process-wide, so
+    the speedup measures quantization and compilation only. Reports the real-time factor of each run, as audio seconds per
+    compute second like the `speech_realtime_factor` metric, and per-text
+    spectral distance and duration ratio.
+    """
+    from .schema import speakers
+
+    texts = texts or QUALITY_TEXTS
+    latents = xtts.conditioning(speaker or speakers[0])
+    model = xtts.synthesizer.tts_model
+    profile.apply_threads()
+    baseline = copy.deepcopy(model)
+    reference, baseline_rtf = _synthesize(
+        baseline, latents, texts=texts, language=language, sample_rate=xtts.sample_rate
+    )
+    del baseline
+    profile.apply(model, device=xtts.device)
+    candidate, candidate_rtf = _synthesize(
+        model, latents, texts=texts, language=language, sample_rate=xtts.sample_rate
+    )
+    return {
+        "profile": repr(profile),
+        "threads": torch.get_num_threads(),
+        "interop_threads": torch.get_num_interop_threads(),
+        "baseline_rtf": baseline_rtf,
+        "candidate_rtf": candidate_rtf,
+        "speedup": candidate_rtf / baseline_rtf if baseline_rtf else 0.0,
+        "texts": [
+            {
+                "text": text,
+                "spectral_distance_db": spectral_distance(ref, cand),
+                "duration_ratio": len(cand) / len(ref) if len(ref) else 0.0,
+            }
+            for text, ref, cand in zip(texts, reference, candidate)
+        ],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare an XTTS inference profile against the fp32 baseline."
+    )
+    parser.add_argument("--profile", choices=["fp32", "int8"], default="int8")
+    parser.add_argument("--compile", action="store_true")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--speaker", default=None)
+    args = parser.parse_args()
+
+    from .service import XTTS
+
+    os.environ["XTTS_PROFILE"] = "fp32"
+    xtts = XTTS.from_pretrained()
+    profile = InferenceProfile(
+        name=args.profile, compile=args.compile, threads=args.threads
+    )
+    report = quality_check(
+        xtts, profile, speaker=args.speaker, language=args.language
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator, Optional
+
+from typing_extensions import Self
+
+from .cache import normalize_sentence
+
+# Per-language character limits enforced by the XTTS v2 tokenizer.
+CHAR_LIMITS: dict[str, int] = {
+    "en": 250,
+    "es": 239,
+    "fr": 273,
+    "de": 253,
+    "it": 213,
+    "nl": 251,
+    "ru": 182,
+    "tr": 226,
+}
+
+CLAUSE_BOUNDARY = re.compile(r"(?<=[,;:–—])\s+")
+
+
+def _pack(pieces: Iterable[str], budget: int) -> Iterator[str]:
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > budget:
+            yield current
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        yield current
+
+
+def _split_words(text: str, limit: int) -> Iterator[str]:
+    words: list[str] = []
+    for word in text.split():
+        # A single word longer than the limit can only be cut.
+        words.extend(word[i : i + limit] for i in range(0, len(word), limit))
+    return _pack(words, limit)
+
+
+def split_long(sentence: str, limit: int) -> Iterator[str]:
+    """Split a sentence longer than `limit` at clause boundaries, then at words."""
+    pieces: list[str] = []
+    for clause in CLAUSE_BOUNDARY.split(sentence):
+        if len(clause) > limit:
+            pieces.extend(_split_words(clause, limit))
+        else:
+            pieces.append(clause)
+    return _pack(pieces, limit)
+
+
+class ChunkPlanner:
+    """
+    Turns segmented sentences into inference chunks.
+
+    Adjacent short sentences are packed together up to `target_chars`, so a
+    list of "Yes." / "Okay." answers costs one inference call instead of many,
+    and sentences above the XTTS per-language limit are split at clause
+    boundaries. A small target favours time to first audio; a large one
+    favours throughput.
+
+    The sentence cache stores whole chunks, so a packed sentence can only be
+    reused next to the same neighbours. Sentences for which `cached` returns
+    True, and sentences seen in an earlier plan (the last `max_seen` are
+    remembered), are therefore kept as chunks of their own: a repeated
+    sentence is synthesized alone once and served from the cache from then
+    on, whatever text it appears in.
+    """
+
+    def __init__(
+        self,
+        *,
+        target_chars: int = 150,
+        max_chars: Optional[int] = None,
+        max_seen: int = 10000,
+    ):
+        self.target_chars = target_chars
+        self.max_chars = max_chars
+        self.max_seen = max_seen
+        self.requests = 0
+        self.chunks = 0
+        self.cached = 0
+        self.repeated = 0
+        self._seen: OrderedDict[str, None] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(target_chars={self.target_chars}, max_chars={self.max_chars})"
+
+    @classmethod
+    def from_env(cls) -> Self:
+        max_chars = os.environ.get("XTTS_CHUNK_MAX_CHARS")
+        return cls(
+            target_chars=int(os.environ.get("XTTS_CHUNK_TARGET_CHARS", "150")),
+            max_chars=int(max_chars) if max_chars else None,
+            max_seen=int(os.environ.get("XTTS_CHUNK_SEEN_SENTENCES", "10000")),
+        )
+
+    def limit(self, language: str) -> int:
+        limit = CHAR_LIMITS.get(language, 250)
+        return min(limit, self.max_chars) if self.max_chars else limit
+
+    def seen(self, sentence: str, *, language: str) -> bool:
+        """Record `sentence` and return whether an earlier call saw it."""
+        key = f"{language}|{normalize_sentence(sentence)}"
+        with self._lock:
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                return True
+            self._seen[key] = None
+            if len(self._seen) > self.max_seen:
+                self._seen.popitem(last=False)
+            return False
+
+    def plan(
+        self,
+        sentences: Iterable[str],
+        *,
+        language: str,
+        cached: Optional[Callable[[str], bool]] = None,
+    ) -> list[str]:
+        limit = self.limit(language)
+        budget = min(self.target_chars, limit)
+        chunks: list[str] = []
+        pieces: list[str] = []
+        for sentence in sentences:
+            repeated = self.seen(sentence, language=language)
+            if cached is not None and cached(sentence):
+                chunks.extend(_pack(pieces, budget))
+                pieces = []
+                chunks.append(sentence)
+                self.cached += 1
+            elif repeated:
+                chunks.extend(_pack(pieces, budget))
+                pieces = []
+                chunks.extend(
+                    split_long(sentence, limit) if len(sentence) > limit else [sentence]
+                )
+                self.repeated += 1
+            elif len(sentence) > limit:
+                pieces.extend(split_long(sentence, limit))
+            else:
+                pieces.append(sentence)
+        chunks.extend(_pack(pieces, budget))
+        self.requests += 1
+        self.chunks += len(chunks)
+        return chunks
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "requests": self.requests,
+            "chunks": self.chunks,
+            "cached_sentences": self.cached,
+            "repeated_sentences": self.repeated,
+            "mean_chunks": self.chunks / self.requests if self.requests else 0.0,
+        }
@@ -0,0 +1,459 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import signal
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import Connection, wait
+from multiprocessing.reduction import recv_handle, send_handle
+from typing import Any, AsyncGenerator, Callable, Iterator, Optional, TypeVar
+
+import torch
+from fastapi import HTTPException, status
+from typing_extensions import ParamSpec
+
+from .worker import InferencePool
+
+T = TypeVar("T")
+P = ParamSpec("P")
+
+logger = logging.getLogger(__name__)
+
+# Child to parent.
+ITEM, DONE, ERROR = "item", "done", "error"
+# Parent to child.
+JOB, CREDIT, CANCEL = "job", "credit", "cancel"
+
+
+def partition_cores(replicas: int) -> list[list[int]]:
+    """Split the cores this process may run on into `replicas` disjoint sets."""
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    size = len(cores) // replicas
+    if size == 0:
+        raise ValueError(f"Cannot pin {replicas} replicas to {len(cores)} cores")
+    return [cores[i * size : (i + 1) * size] for i in range(replicas)]
+
+
+class _Disconnected(Exception):
+    """The parent closed its end of the pipe or went away."""
+
+
+class _Inbox:
+    """
+    Messages from the parent as seen by a replica: queued jobs, stream
+    credits and cancellations. Job ids reach a replica in increasing order
+    and run first-in first-out, so anything addressed to an id at or below
+    the last finished one is stale and dropped.
+    """
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+        self.jobs: deque[tuple[Any, ...]] = deque()
+        self.credits: dict[int, int] = {}
+        self.cancelled: set[int] = set()
+        self.finished = -1
+
+    def handle(self, message: tuple[Any, ...]) -> None:
+        kind, job_id = message[0], message[1]
+        if kind == JOB:
+            self.jobs.append(message[1:])
+        elif job_id <= self.finished:
+            return
+        elif kind == CREDIT:
+            self.credits[job_id] = self.credits.get(job_id, 0) + 1
+        elif kind == CANCEL:
+            self.cancelled.add(job_id)
+
+    def wait(self) -> None:
+        """Block for one message."""
+        try:
+            self.handle(self.conn.recv())
+        except (EOFError, OSError) as e:
+            raise _Disconnected from e
+
+    def drain(self) -> None:
+        """Handle every message that has already arrived."""
+        try:
+            while self.conn.poll():
+                self.handle(self.conn.recv())
+        except (EOFError, OSError) as e:
+            raise _Disconnected from e
+
+    def send(self, job_id: int, kind: str, payload: Any) -> None:
+        try:
+            self.conn.send((job_id, kind, payload))
+        except OSError as e:
+            raise _Disconnected from e
+
+    def next_job(self) -> tuple[Any, ...]:
+        while not self.jobs:
+            self.wait()
+        return self.jobs.popleft()
+
+    def finish(self, job_id: int) -> None:
+        self.finished = job_id
+        self.credits.pop(job_id, None)
+        self.cancelled.discard(job_id)
+
+
+def _serve(
+    model: Any,
+    cores: list[int],
+    threads: int,
+    conn: Connection,
+    buffer: int,
+) -> None:
+    """Replica main loop; runs in a forked child that shares the parent's weights."""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(threads)
+    inbox = _Inbox(conn)
+    try:
+        while True:
+            job_id, method, streaming, args, kwargs = inbox.next_job()
+            try:
+                inbox.drain()
+                if job_id in inbox.cancelled:
+                    inbox.send(job_id, ERROR, "Cancelled")
+                    continue
+                result = getattr(model, method)(*args, **kwargs)
+                if streaming:
+                    inbox.credits[job_id] = inbox.credits.get(job_id, 0) + buffer
+                    for item in result:
+                        inbox.drain()
+                        # Stay at most `buffer` items ahead of the consumer.
+                        while inbox.credits[job_id] <= 0 and job_id not in inbox.cancelled:
+                            inbox.wait()
+                        if job_id in inbox.cancelled:
+                            result.close()
+                            break
+                        inbox.credits[job_id] -= 1
+                        inbox.send(job_id, ITEM, item)
+                    result = None
+                inbox.send(job_id, DONE, result)
+            except _Disconnected:
+                raise
+            except Exception as e:
+                inbox.send(job_id, ERROR, f"{e.__class__.__name__}: {e}")
+            finally:
+                inbox.finish(job_id)
+    except _Disconnected:
+        return
+
+
+def _zygote(
+    model: Any, control: Connection, inherited: Connection, buffer: int
+) -> None:
+    """
+    Fork replicas on request. Runs in a single-threaded child forked before
+    the parent starts any thread of its own, so replicas never inherit locks
+    held by the server's threads, however late they are restarted.
+
+    Each request is (cores, threads); the reply is the replica's pid followed
+    by the parent end of its pipe, passed as a file descriptor.
+    """
+    # The parent's end, so closing it there reaches us as EOF.
+    inherited.close()
+    # Replicas are reaped automatically; the parent notices an exit as EOF.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    while True:
+        try:
+            cores, threads = control.recv()
+        except (EOFError, OSError):
+            return
+        parent, child = mp.Pipe(duplex=True)
+        pid = os.fork()
+        if pid == 0:
+            control.close()
+            parent.close()
+            code = 0
+            try:
+                _serve(model, cores, threads, child, buffer)
+            except BaseException:
+                logger.exception("XTTS replica failed")
+                code = 1
+            finally:
+                os._exit(code)
+        child.close()
+        try:
+            control.send(pid)
+            send_handle(control, parent.fileno(), os.getppid())
+        except OSError:
+            return
+        finally:
+            parent.close()
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+class Replica:
+    def __init__(self, index: int, cores: list[int]):
+        self.index = index
+        self.cores = cores
+        self.in_flight = 0
+        self.restarts = 0
+        self.healthy = True
+        self.conn: Optional[Connection] = None
+        self.pid: Optional[int] = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(index={self.index}, cores={self.cores}, in_flight={self.in_flight})"
+
+
+class ReplicaPool(InferencePool):
+    """
+    Inference pool backed by forked model replicas instead of threads.
+
+    The parent moves the model weights into shared memory once and then forks
+    `replicas` children, each pinned to a disjoint core set with its own
+    intra-op thread count, so N replicas cost one copy of the weights. Jobs
+    are dispatched to the least-loaded replica by method name, since the
+    children already hold the model, over one duplex pipe per child that also
+    carries stream credits and cancellations.
+
+    Replicas are not forked by this process, which runs the event loop and
+    the reader thread, but by a zygote forked once before either exists (see
+    `_zygote`), so a replica restarted from the reader thread starts from the
+    same clean state as the first ones.
+
+    A reader thread waits on every pipe. When a child dies its pipe reaches
+    EOF, its outstanding jobs fail and it is forked again; a child that
+    cannot be restarted is taken out of rotation.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        *,
+        replicas: int,
+        threads: Optional[int] = None,
+        max_queue: int = 32,
+        buffer: int = 8,
+    ):
+        super().__init__(workers=replicas, max_queue=max_queue, buffer=buffer)
+        self.model = model
+        self.threads = threads
+        self._context = mp.get_context("fork")
+        self.replicas = [
+            Replica(index, cores)
+            for index, cores in enumerate(partition_cores(replicas))
+        ]
+        self._ids = itertools.count()
+        self._jobs: dict[
+            int, tuple[asyncio.AbstractEventLoop, asyncio.Queue[Any], Replica, Connection]
+        ] = {}
+        self._closed = False
+        self._spawn_lock = threading.Lock()
+        model.share_memory()
+        self._control, control = self._context.Pipe(duplex=True)
+        self._zygote = self._context.Process(
+            target=_zygote,
+            args=(model, control, self._control, buffer),
+            name="xtts-replica-zygote",
+            daemon=True,
+        )
+        self._zygote.start()
+        control.close()
+        for replica in self.replicas:
+            self._start(replica)
+        self._reader = threading.Thread(
+            target=self._read_results, name="xtts-replica-results", daemon=True
+        )
+        self._reader.start()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(replicas={len(self.replicas)}, max_queue={self.max_queue})"
+
+    def stats(self) -> dict[str, Any]:
+        stats: dict[str, Any] = dict(super().stats())
+        stats["replicas"] = [
+            {
+                "index": r.index,
+                "cores": len(r.cores),
+                "in_flight": r.in_flight,
+                "healthy": r.healthy,
+                "restarts": r.restarts,
+            }
+            for r in self.replicas
+        ]
+        return stats
+
+    def _start(self, replica: Replica) -> None:
+        with self._spawn_lock:
+            self._control.send((replica.cores, self.threads or len(replica.cores)))
+            replica.pid = self._control.recv()
+            replica.conn = Connection(recv_handle(self._control))
+
+    def _read_results(self) -> None:
+        while not self._closed:
+            conns = {r.conn: r for r in self.replicas if r.healthy and r.conn is not None}
+            try:
+                ready = wait(list(conns), timeout=1.0)
+            except OSError:
+                continue
+            for conn in ready:
+                try:
+                    self._post(conn.recv())  # type: ignore
+                except (EOFError, OSError):
+                    if not self._closed:
+                        self._replace(conns[conn])  # type: ignore
+
+    def _post(self, message: tuple[int, str, Any]) -> None:
+        job = self._jobs.get(message[0])
+        if job is None:
+            return
+        try:
+            job[0].call_soon_threadsafe(self._deliver, *message)
+        except RuntimeError:
+            pass
+
+    def _replace(self, replica: Replica) -> None:
+        """Fork a new process for a replica that exited and fail the old one's jobs."""
+        assert replica.conn is not None
+        conn = replica.conn
+        conn.close()
+        logger.error("XTTS replica %d (pid %s) exited", replica.index, replica.pid)
+        try:
+            self._start(replica)
+            replica.restarts += 1
+        except Exception:
+            logger.exception("Failed to restart XTTS replica %d", replica.index)
+            replica.healthy = False
+        for job_id, job in list(self._jobs.items()):
+            if job[3] is conn:
+                self._post((job_id, ERROR, f"Replica {replica.index} exited"))
+
+    def _deliver(self, job_id: int, kind: str, payload: Any) -> None:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        _, queue, replica, _ = job
+        if kind != ITEM:
+            del self._jobs[job_id]
+            replica.in_flight -= 1
+            self.release()
+        queue.put_nowait((kind, payload))
+
+    def _send(self, conn: Connection, message: tuple[Any, ...]) -> bool:
+        try:
+            conn.send(message)
+            return True
+        except OSError:
+            return False
+
+    def _method(self, func: Callable[..., Any]) -> str:
+        if getattr(func, "__self__", None) is not self.model:
+            raise ValueError(f"{func!r} is not a method of the replicated model")
+        return func.__name__
+
+    async def _submit(
+        self,
+        func: Callable[..., Any],
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+        *,
+        streaming: bool,
+        replica: Optional[Replica] = None,
+    ) -> tuple[int, "asyncio.Queue[Any]", Connection]:
+        method = self._method(func)
+        await self.acquire()
+        if replica is None:
+            healthy = [r for r in self.replicas if r.healthy]
+            if not healthy:
+                self.release()
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="No healthy inference replica",
+                )
+            replica = min(healthy, key=lambda r: r.in_flight)
+        replica.in_flight += 1
+        job_id = next(self._ids)
+        queue: asyncio.Queue[Any] = asyncio.Queue()
+        conn = replica.conn
+        assert conn is not None
+        self._jobs[job_id] = (asyncio.get_running_loop(), queue, replica, conn)
+        if not self._send(conn, (JOB, job_id, method, streaming, args, kwargs)):
+            self._deliver(job_id, ERROR, f"Replica {replica.index} is unavailable")
+        return job_id, queue, conn
+
+    async def _result(self, job_id: int, queue: "asyncio.Queue[Any]", conn: Connection) -> Any:
+        try:
+            kind, payload = await queue.get()
+        except asyncio.CancelledError:
+            # Skip the job if the replica has not started it yet.
+            self._send(conn, (CANCEL, job_id))
+            raise
+        if kind == ERROR:
+            raise RuntimeError(payload)
+        return payload
+
+    async def run(self, func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        return await self._result(*await self._submit(func, args, kwargs, streaming=False))
+
+    async def broadcast(
+        self, func: Callable[P, T], *args: P.args, **kwargs: P.kwargs
+    ) -> list[T]:
+        async def on(replica: Replica) -> T:
+            job = await self._submit(func, args, kwargs, streaming=False, replica=replica)
+            return await self._result(*job)
+
+        return list(
+            await asyncio.gather(*(on(r) for r in self.replicas if r.healthy))
+        )
+
+    async def stream(
+        self, func: Callable[P, Iterator[T]], *args: P.args, **kwargs: P.kwargs
+    ) -> AsyncGenerator[T, None]:
+        """
+        Relay a generator running on a replica. The replica starts with
+        `buffer` credits and gets one back per item consumed, and is told to
+        stop if the consumer goes away before the generator is exhausted.
+        """
+        job_id, queue, conn = await self._submit(func, args, kwargs, streaming=True)
+        finished = False
+        try:
+            while True:
+                kind, payload = await queue.get()
+                if kind != ITEM:
+                    finished = True
+                    if kind == ERROR:
+                        raise RuntimeError(payload)
+                    return
+                self._send(conn, (CREDIT, job_id))
+                yield payload
+        finally:
+            if not finished:
+                self._send(conn, (CANCEL, job_id))
+
+    def shutdown(self) -> None:
+        self._closed = True
+        for replica in self.replicas:
+            if replica.conn is not None:
+                replica.conn.close()
+        # Replicas exit on EOF; the zygote reaps them while it is alive.
+        deadline = time.monotonic() + 5
+        for replica in self.replicas:
+            if replica.pid is None:
+                continue
+            while _alive(replica.pid) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            if _alive(replica.pid):
+                os.kill(replica.pid, signal.SIGTERM)
+        self._control.close()
+        self._zygote.join(timeout=5)
+        if self._zygote.is_alive():
+            self._zygote.terminate()
+        self._reader.join(timeout=5)
+        super().shutdown()
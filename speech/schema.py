@@ -10,25 +10,27 @@ from typing_extensions import Self, TypeAlias
 
 
 def compute_fingerprint(
-    audio_data: Union[bytes, np.ndarray], user: str, secret_text: str = "default_secret"
+    audio_data: Union[bytes, np.ndarray], secret_text: str = "default_secret"
 ) -> str:
     """
-    Compute a fingerprint for voice data using audio content, user ID, and a secret text.
+    Compute a content fingerprint for voice data using the audio and a secret text.
+
+    The uploading user is deliberately not part of it, so identical
+    recordings map to the same voice whoever registers them.
 
     Args:
         audio_data: Either raw bytes or numpy array of audio data
-        user: UUID of the user
         secret_text: Secret text to use in fingerprint generation
 
     Returns:
         str: Hex digest of the fingerprint
     """
-    # Convert bytes to numpy array if needed
-    if isinstance(audio_data, bytes):
-        audio_data = np.frombuffer(audio_data, dtype=np.int16)
-
-    # Ensure audio_data is a numpy array
-    if not isinstance(audio_data, np.ndarray):
+    # Ensure audio_data is bytes or a numpy array
+    if isinstance(audio_data, np.ndarray):
+        audio_bytes = audio_data.tobytes()
+    elif isinstance(audio_data, bytes):
+        audio_bytes = audio_data
+    else:
         raise ValueError("Audio data must be either bytes or numpy array")
 
     # Create a SHA-256 hasher
@@ -37,15 +39,9 @@ def compute_fingerprint(
     # Add the secret text first
     hasher.update(secret_text.encode("utf-8"))
 
-    # Add the user UUID
-    hasher.update(str(user).encode("utf-8"))
-
     # Process audio data in chunks to handle large files efficiently
     chunk_size = 8192  # Process 8KB at a time
 
-    # Convert audio data to bytes if it's not already
-    audio_bytes = audio_data.tobytes()
-
     for i in range(0, len(audio_bytes), chunk_size):
         chunk = audio_bytes[i : i + chunk_size]
         hasher.update(chunk)
@@ -180,6 +176,28 @@ speakers: list[SpeakerName] = [
 SpeakerLanguage: TypeAlias = Literal["en", "es", "fr", "de", "it", "nl", "ru", "tr"]
 AudioFormat: TypeAlias = Literal["mp3", "wav", "ogg", "flac"]
 
+warmup_phrases: dict[SpeakerLanguage, str] = {
+    "en": "Hello, this is a test.",
+    "es": "Hola, esto es una prueba.",
+    "fr": "Bonjour, ceci est un test.",
+    "de": "Hallo, das ist ein Test.",
+    "it": "Ciao, questa è una prova.",
+    "nl": "Hallo, dit is een test.",
+    "ru": "Привет, это тест.",
+    "tr": "Merhaba, bu bir test.",
+}
+
+language_names: dict[SpeakerLanguage, str] = {
+    "en": "English",
+    "es": "Spanish",
+    "fr": "French",
+    "de": "German",
+    "it": "Italian",
+    "nl": "Dutch",
+    "ru": "Russian",
+    "tr": "Turkish",
+}
+
 
 def get_speaker() -> SpeakerName:
     try:
@@ -203,10 +221,17 @@ class VoiceObject(BaseModel):
     ) -> Self:
         data = await upload.read()
         return cls(
-            fingerprint=compute_fingerprint(data, str(user)), user=str(user), audio=data
+            fingerprint=compute_fingerprint(data), user=str(user), audio=data
         )
 
 
+class VoiceInfo(BaseModel):
+    id: str = Field(..., description="Content fingerprint of the reference audio.")
+    user: str = Field(..., description="The user that registered the voice.")
+    size: int = Field(..., description="Size of the reference audio in bytes.")
+    created_at: float = Field(..., description="Unix timestamp of the registration.")
+
+
 class CreateSpeechRequest(BaseModel):
     model: Literal["xtts"] = Field(
         default="xtts", description="The speech synthesis model to use."
@@ -230,6 +255,16 @@ class CreateSpeechRequest(BaseModel):
     language: SpeakerLanguage = Field(
         default="en", description="The language of the input text."
     )
+    stream: bool = Field(
+        default=False,
+        description="Emit audio incrementally as the model decodes it, instead of once per sentence.",
+    )
+    stream_chunk_size: int = Field(
+        default=20,
+        ge=5,
+        le=200,
+        description="GPT tokens decoded per streamed chunk; smaller chunks lower time to first audio.",
+    )
 
     def speaker(self) -> str:
         return self.voice_id or self.voice
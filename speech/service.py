@@ -1,21 +1,79 @@
-import io
-from typing import Any, AsyncGenerator, Type
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, AsyncIterable, Iterator, Optional, Type, Union
 
-import spacy
+import numpy as np
 import torch
+from fastapi import HTTPException, status
 from fastapi.responses import StreamingResponse
-from pydub import AudioSegment  # type: ignore
 from TTS.api import TTS  # type: ignore
 from typing_extensions import Self
 
-from .schema import AudioFormat, CreateSpeechRequest, SpeakerLanguage
+from shared.metrics import RATIO_BUCKETS, registry
+from shared.segment import SentenceSegmenter
+
+from .cache import SentenceCache
+from .encoder import StreamEncoder
+from .latents import Latents, SpeakerLatentCache
+from .schema import (
+    AudioFormat,
+    CreateSpeechRequest,
+    SpeakerLanguage,
+    speakers,
+    warmup_phrases,
+)
+from .optimize import InferenceProfile
+from .planner import ChunkPlanner
+from .replicas import ReplicaPool
+from .voices import VoiceStore
+from .worker import InferencePool
+
+segmentation_seconds = registry.histogram(
+    "speech_segmentation_seconds",
+    "Time to split a request into sentences and plan its chunks.",
+    ("language",),
+)
+encoding_seconds = registry.histogram(
+    "speech_encoding_seconds",
+    "Time spent encoding one waveform chunk into the response format.",
+    ("format",),
+)
+first_byte_seconds = registry.histogram(
+    "speech_time_to_first_byte_seconds",
+    "Time from the start of stream_audio to its first audio bytes.",
+    ("language", "format"),
+)
+inference_seconds = registry.histogram(
+    "speech_inference_seconds",
+    "Compute time of one sentence on an inference worker.",
+    ("language",),
+)
+queue_wait_seconds = registry.histogram(
+    "speech_queue_wait_seconds",
+    "Time a synthesis job waited for an inference worker before it started.",
+    ("language",),
+)
+realtime_factor = registry.histogram(
+    "speech_realtime_factor",
+    "Seconds of audio synthesized per second of inference, per sentence.",
+    ("language", "voice"),
+    buckets=RATIO_BUCKETS,
+)
 
 
 class XTTS(TTS):
     def __init__(self, *args: Any, **kwargs: Any):
         super().__init__(*args, **kwargs)
-        self.nlp_en = spacy.load("en_core_web_sm")
-        self.nlp_es = spacy.load("es_core_news_sm")
+        self.segmenter = SentenceSegmenter()
+        self.planner = ChunkPlanner.from_env()
+        self.latents = SpeakerLatentCache.from_env()
+        self.voices = VoiceStore.from_env()
+        self.sentence_cache = SentenceCache.from_env()
+        self.pool = InferencePool.from_env()
+        self.lookahead = int(os.environ.get("XTTS_LOOKAHEAD", "2"))
+        self._generations: dict[str, float] = {}
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}(path={self.path})"
@@ -24,19 +82,430 @@ class XTTS(TTS):
     def from_pretrained(
         cls: Type[Self], *, path: str = "tts_models/multilingual/multi-dataset/xtts_v2"
     ) -> Self:
-        return cls(path).to(
+        xtts = cls(path).to(
             torch.device(
                 "cuda"
                 if torch.cuda.is_available()
                 else torch.device("mps") if torch.backends.mps.is_available() else "cpu"
             )
         )
+        InferenceProfile.from_env().apply(xtts.synthesizer.tts_model, device=xtts.device)
+        xtts.warm_speakers()
+        return xtts
+
+    def start_replicas(self, replicas: int, *, threads: Optional[int] = None) -> None:
+        """
+        Serve inference from `replicas` forked processes sharing this model's
+        weights. Must run before any inference happens in this process.
+        """
+        self.pool = ReplicaPool(
+            self,
+            replicas=replicas,
+            threads=threads,
+            max_queue=self.pool.max_queue,
+            buffer=self.pool.buffer,
+        )
+
+    def split_text(self, *, text: str, language: str) -> Iterator[str]:
+        return self.segmenter.split(text=text, language=language)
+
+    def plan_chunks(
+        self,
+        *,
+        text: str,
+        language: str,
+        speaker: Optional[str] = None,
+        speed: float = 1.0,
+    ) -> list[str]:
+        """
+        Segment `text` and pack the sentences into inference-sized chunks.
+        With `speaker`, sentences already in the sentence cache for that
+        voice and speed stay unpacked so they are not synthesized again.
+        """
+
+        def cached(sentence: str) -> bool:
+            assert speaker is not None
+            return (
+                self.sentence_key(
+                    text=sentence, speaker=speaker, language=language, speed=speed
+                )
+                in self.sentence_cache
+            )
+
+        with segmentation_seconds.time(language=language):
+            return self.planner.plan(
+                self.split_text(text=text, language=language),
+                language=language,
+                cached=cached if speaker is not None else None,
+            )
+
+    @property
+    def sample_rate(self) -> int:
+        return self.synthesizer.output_sample_rate  # type: ignore
+
+    @property
+    def device(self) -> torch.device:
+        return next(self.synthesizer.tts_model.parameters()).device  # type: ignore
+
+    def is_builtin(self, speaker: str) -> bool:
+        return speaker in self.synthesizer.tts_model.speaker_manager.speakers  # type: ignore
+
+    def voice_exists(self, speaker: str) -> bool:
+        """Whether `speaker` is a built-in voice or a registered custom one."""
+        return self.is_builtin(speaker) or self.voices.get(speaker) is not None
+
+    def voice_generation(self, speaker: str) -> Optional[float]:
+        """Registration time of a custom voice, None for built-in voices."""
+        if self.is_builtin(speaker):
+            return None
+        generation = self._generations.get(speaker)
+        if generation is None:
+            info = self.voices.get(speaker)
+            if info is None:
+                return None
+            generation = self._generations[speaker] = info.created_at
+        return generation
+
+    def sentence_key(
+        self, *, text: str, speaker: str, language: str, speed: float
+    ) -> str:
+        return SentenceCache.key(
+            text=text,
+            speaker=speaker,
+            language=language,
+            speed=speed,
+            generation=self.voice_generation(speaker),
+        )
+
+    def builtin_conditioning(self, speaker: str) -> Latents:
+        try:
+            latents = self.synthesizer.tts_model.speaker_manager.speakers[speaker]  # type: ignore
+        except KeyError as e:
+            raise ValueError(f"Unknown voice: {speaker}") from e
+        return (
+            latents["gpt_cond_latent"].to(self.device),
+            latents["speaker_embedding"].to(self.device),
+        )
+
+    def warm_speakers(self) -> None:
+        """Pre-populate the latent cache with every built-in voice."""
+        for speaker in speakers:
+            try:
+                self.latents.put(speaker, self.builtin_conditioning(speaker))
+            except ValueError:
+                continue
+
+    def warmup(self) -> None:
+        """Run one short synthesis per supported language to settle kernels and allocators."""
+        for language, phrase in warmup_phrases.items():
+            for sentence in self.split_text(text=phrase, language=language):
+                self.synthesize_sentence(
+                    text=sentence, speaker=speakers[0], language=language, speed=1.0
+                )
+
+    def register_voice(self, key: str, audio_path: str) -> Latents:
+        """Compute conditioning for a reference recording and cache it under `key`."""
+        with torch.inference_mode():
+            latents = self.synthesizer.tts_model.get_conditioning_latents(  # type: ignore
+                audio_path=[audio_path]
+            )
+        self.latents.put(key, latents)
+        return latents
+
+    def cache_voice(self, key: str, latents: Latents) -> None:
+        """Add conditioning registered elsewhere to this instance's latent cache."""
+        self.latents.put(key, latents)
+
+    def forget_voice(self, key: str) -> None:
+        """
+        Evict a deleted voice from this instance's latent cache. Its sentence
+        cache entries become unreachable, since the next registration of the
+        same audio gets a new generation.
+        """
+        self.latents.delete(key)
+        self._generations.pop(key, None)
+
+    def resolve_conditioning(self, speaker: str) -> Latents:
+        try:
+            return self.builtin_conditioning(speaker)
+        except ValueError:
+            latents = self.voices.load(speaker, self.device)
+            if latents is None:
+                raise
+            return latents
+
+    def conditioning(self, speaker: str) -> Latents:
+        return self.latents.get(speaker, lambda: self.resolve_conditioning(speaker))
+
+    def synthesize_sentence(
+        self, *, text: str, speaker: str, language: str, speed: float
+    ) -> np.ndarray:
+        """Synthesize one sentence. Runs on an inference worker."""
+        model = self.synthesizer.tts_model  # type: ignore
+        gpt_cond_latent, speaker_embedding = self.conditioning(speaker)
+        with torch.inference_mode():
+            out = model.inference(
+                text,
+                language,
+                gpt_cond_latent,
+                speaker_embedding,
+                speed=speed,
+            )
+        wav = out["wav"]
+        if isinstance(wav, torch.Tensor):
+            wav = wav.cpu().numpy()
+        return np.asarray(wav, dtype=np.float32).squeeze()
+
+    def synthesize_timed(
+        self, *, text: str, speaker: str, language: str, speed: float
+    ) -> tuple[np.ndarray, float]:
+        """`synthesize_sentence` plus its compute time, measured on the worker."""
+        start = time.perf_counter()
+        wav = self.synthesize_sentence(
+            text=text, speaker=speaker, language=language, speed=speed
+        )
+        return wav, time.perf_counter() - start
+
+    def synthesize_stream(
+        self,
+        *,
+        chunks: list[str],
+        speaker: str,
+        language: str,
+        speed: float,
+        chunk_size: int,
+    ) -> Iterator[tuple[int, np.ndarray, Optional[float]]]:
+        """
+        Yield audio while XTTS is still generating it.
+
+        Uses the model's streaming inference, which vocodes partial GPT latents
+        every `chunk_size` tokens, so the first chunk is available long before
+        the sentence is complete. Each item is the index of its chunk, the
+        audio, and the compute time spent producing it, or None when the chunk
+        came from the sentence cache. Time spent suspended while the consumer
+        catches up is not counted.
+        """
+        model = self.synthesizer.tts_model  # type: ignore
+        gpt_cond_latent, speaker_embedding = self.conditioning(speaker)
+        for index, text in enumerate(chunks):
+            key = self.sentence_key(
+                text=text, speaker=speaker, language=language, speed=speed
+            )
+            cached = self.sentence_cache.get(key)
+            if cached is not None:
+                yield index, cached, None
+                continue
+            parts: list[np.ndarray] = []
+            with torch.inference_mode():
+                start = time.perf_counter()
+                outputs = model.inference_stream(
+                    text,
+                    language,
+                    gpt_cond_latent,
+                    speaker_embedding,
+                    stream_chunk_size=chunk_size,
+                    speed=speed,
+                    enable_text_splitting=False,
+                )
+                for output in outputs:
+                    wav = output.cpu().numpy().astype(np.float32).squeeze()
+                    parts.append(wav)
+                    yield index, wav, time.perf_counter() - start
+                    start = time.perf_counter()
+            self.sentence_cache.set(key, np.concatenate(parts))
+
+    async def synthesize_chunk(
+        self, *, text: str, speaker: str, language: str, speed: float
+    ) -> np.ndarray:
+        key = self.sentence_key(
+            text=text, speaker=speaker, language=language, speed=speed
+        )
+        # Identical sentences requested concurrently share one synthesis.
+        return await self.sentence_cache.aget_or_compute(
+            key,
+            lambda: self.infer(
+                text=text, speaker=speaker, language=language, speed=speed
+            ),
+        )
+
+    def observe_inference(
+        self, *, speaker: str, language: str, seconds: float, samples: int
+    ) -> None:
+        inference_seconds.observe(seconds, language=language)
+        if seconds > 0:
+            # Custom voice ids would explode label cardinality.
+            voice = speaker if speaker in speakers else "custom"
+            realtime_factor.observe(
+                samples / self.sample_rate / seconds, language=language, voice=voice
+            )
+
+    async def infer(
+        self, *, text: str, speaker: str, language: str, speed: float
+    ) -> np.ndarray:
+        """
+        Run `synthesize_sentence` on the pool. Compute time is measured on the
+        worker; the rest of the wall time is reported as queue wait.
+        """
+        start = time.perf_counter()
+        wav, seconds = await self.pool.run(
+            self.synthesize_timed,
+            text=text,
+            speaker=speaker,
+            language=language,
+            speed=speed,
+        )
+        queue_wait_seconds.observe(
+            max(time.perf_counter() - start - seconds, 0.0), language=language
+        )
+        self.observe_inference(
+            speaker=speaker, language=language, seconds=seconds, samples=len(wav)
+        )
+        return wav
+
+    async def generate(
+        self,
+        *,
+        chunks: Union[list[str], AsyncIterable[str]],
+        speaker: str,
+        language: SpeakerLanguage,
+        speed: float,
+        stream: bool = False,
+        stream_chunk_size: int = 20,
+    ) -> AsyncGenerator[np.ndarray, None]:
+        """
+        Yield the waveforms for the planned `chunks` in playback order.
+        `chunks` may be an async iterable whose texts are still being
+        produced, e.g. by translation; per-token streaming needs a list.
+        """
+        if isinstance(chunks, AsyncIterable):
+            async for wav in self._generate_incremental(
+                chunks, speaker=speaker, language=language, speed=speed
+            ):
+                yield wav
+            return
+        if stream:
+            async for wav in self._generate_stream(
+                chunks,
+                speaker=speaker,
+                language=language,
+                speed=speed,
+                chunk_size=stream_chunk_size,
+            ):
+                yield wav
+            return
+        # Keep up to `lookahead` chunks in flight ahead of the one being
+        # encoded and sent. The generator is suspended while the client
+        # drains, so a slow reader stops new inference from being scheduled.
+        pending: deque[asyncio.Task[np.ndarray]] = deque()
+        try:
+            for text in chunks:
+                pending.append(
+                    asyncio.ensure_future(
+                        self.synthesize_chunk(
+                            text=text, speaker=speaker, language=language, speed=speed
+                        )
+                    )
+                )
+                if len(pending) > self.lookahead:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _generate_stream(
+        self,
+        chunks: list[str],
+        *,
+        speaker: str,
+        language: SpeakerLanguage,
+        speed: float,
+        chunk_size: int,
+    ) -> AsyncGenerator[np.ndarray, None]:
+        # Per-chunk compute time and audio length are summed over the pieces
+        # `synthesize_stream` yields and recorded once the chunk is complete.
+        start = time.perf_counter()
+        first = True
+        current: Optional[int] = None
+        seconds = 0.0
+        samples = 0
+        async for index, wav, elapsed in self.pool.stream(
+            self.synthesize_stream,
+            chunks=chunks,
+            speaker=speaker,
+            language=language,
+            speed=speed,
+            chunk_size=chunk_size,
+        ):
+            if first:
+                first = False
+                queue_wait_seconds.observe(
+                    max(time.perf_counter() - start - (elapsed or 0.0), 0.0),
+                    language=language,
+                )
+            if elapsed is not None:
+                if index != current:
+                    if current is not None:
+                        self.observe_inference(
+                            speaker=speaker,
+                            language=language,
+                            seconds=seconds,
+                            samples=samples,
+                        )
+                    current, seconds, samples = index, 0.0, 0
+                seconds += elapsed
+                samples += len(wav)
+            yield wav
+        if current is not None:
+            self.observe_inference(
+                speaker=speaker, language=language, seconds=seconds, samples=samples
+            )
 
-    def split_text(self, *, text: str, language: str):
-        nlp = self.nlp_en if language == "en" else self.nlp_es
-        doc = nlp(text)
-        for sent in doc.sents:
-            yield sent.text
+    async def _generate_incremental(
+        self,
+        chunks: AsyncIterable[str],
+        *,
+        speaker: str,
+        language: SpeakerLanguage,
+        speed: float,
+    ) -> AsyncGenerator[np.ndarray, None]:
+        # Schedule chunks as they arrive while earlier ones are played back,
+        # with at most `lookahead` chunks in flight ahead of the consumer.
+        queue: asyncio.Queue[Optional[asyncio.Task[np.ndarray]]] = asyncio.Queue()
+        slots = asyncio.Semaphore(max(self.lookahead, 1))
+
+        async def schedule() -> None:
+            try:
+                async for text in chunks:
+                    await slots.acquire()
+                    queue.put_nowait(
+                        asyncio.ensure_future(
+                            self.synthesize_chunk(
+                                text=text, speaker=speaker, language=language, speed=speed
+                            )
+                        )
+                    )
+            finally:
+                queue.put_nowait(None)
+
+        scheduler = asyncio.ensure_future(schedule())
+        try:
+            while True:
+                task = await queue.get()
+                if task is None:
+                    break
+                wav = await task
+                slots.release()
+                yield wav
+            # Surface errors from the chunk source.
+            await scheduler
+        finally:
+            scheduler.cancel()
+            while not queue.empty():
+                task = queue.get_nowait()
+                if task is not None:
+                    task.cancel()
 
     async def stream_audio(
         self,
@@ -46,35 +515,85 @@ class XTTS(TTS):
         language: SpeakerLanguage,
         speed: float,
         response_format: AudioFormat,
+        stream: bool = False,
+        stream_chunk_size: int = 20,
+        chunks: Optional[Union[list[str], AsyncIterable[str]]] = None,
     ) -> AsyncGenerator[bytes, None]:
-        for group in self.split_text(text=text, language=language):
-            audio_buffer = io.BytesIO()
-            self.tts_to_file(  # type: ignore
-                text=group,
-                speaker=speaker,
+        start = time.perf_counter()
+        first = True
+
+        def first_byte() -> None:
+            nonlocal first
+            if first:
+                first = False
+                first_byte_seconds.observe(
+                    time.perf_counter() - start, language=language, format=response_format
+                )
+
+        if chunks is None:
+            chunks = await asyncio.to_thread(
+                self.plan_chunks,
+                text=text,
                 language=language,
-                file_path=audio_buffer,  # type: ignore
+                speaker=speaker,
                 speed=speed,
-                split_sentences=False,
             )
-            chunk_buffer = io.BytesIO()
-            audio_buffer.seek(0)
-            segment: AudioSegment = AudioSegment.from_file(audio_buffer, format="wav", frame_rate=22050, channels=1, sample_width=2)  # type: ignore
-            segment.export(out_f=chunk_buffer, format=response_format)  # type: ignore
-            chunk_buffer.seek(0)
-            for chunk in iter(lambda: chunk_buffer.read(4096), b""):
+        encoder = StreamEncoder(
+            response_format=response_format, sample_rate=self.sample_rate
+        )
+        await encoder.open()
+        try:
+            async for wav in self.generate(
+                chunks=chunks,
+                speaker=speaker,
+                language=language,
+                speed=speed,
+                stream=stream,
+                stream_chunk_size=stream_chunk_size,
+            ):
+                encode_start = time.perf_counter()
+                await encoder.write(wav)
+                ready = list(encoder.ready())
+                encoding_seconds.observe(
+                    time.perf_counter() - encode_start, format=response_format
+                )
+                for chunk in ready:
+                    first_byte()
+                    yield chunk
+            async for chunk in encoder.finish():
+                first_byte()
                 yield chunk
-            chunk_buffer.close()
-            audio_buffer.close()
+        finally:
+            await encoder.aclose()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "pool": self.pool.stats(),
+            "latents": self.latents.stats(),
+            "sentences": self.sentence_cache.stats(),
+            "planner": self.planner.stats(),
+        }
 
     def handler(self, body: CreateSpeechRequest) -> StreamingResponse:
+        self.pool.check_capacity()
+        speaker = body.speaker()
+        if not self.voice_exists(speaker):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=f"Voice {speaker} not found"
+            )
+        chunks = self.plan_chunks(
+            text=body.text, language=body.language, speaker=speaker, speed=body.speed
+        )
         return StreamingResponse(
             self.stream_audio(
                 text=body.text,
-                speaker=body.speaker(),
+                chunks=chunks,
+                speaker=speaker,
                 language=body.language,
                 speed=body.speed,
                 response_format=body.response_format,
+                stream=body.stream,
+                stream_chunk_size=body.stream_chunk_size,
             ),
             media_type=f"audio/{body.response_format}",
             headers={
@@ -84,5 +603,6 @@ class XTTS(TTS):
                 "Transfer-Encoding": "chunked",
                 "X-Accel-Buffering": "no",
                 "Accept-Ranges": "bytes",
+                "X-Chunk-Count": str(len(chunks)),
             },
         )
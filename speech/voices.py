@@ -0,0 +1,127 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from typing import Optional
+
+import numpy as np
+import torch
+from typing_extensions import Self
+
+from .latents import Latents
+from .schema import VoiceInfo, VoiceObject
+
+FINGERPRINT = re.compile(r"^[0-9a-f]{64}$")
+
+
+class VoiceStore:
+    """
+    Content-addressed storage for cloned voices.
+
+    Each voice lives under `<root>/<fingerprint>/` with its reference audio,
+    its conditioning latents as .npy arrays and a meta.json. A registration
+    is written to a hidden staging directory and renamed into place once
+    complete, so a failed one never leaves a partial voice behind. Latents are
+    memory-mapped on load, so workers share the page cache instead of
+    re-reading or re-analysing the reference audio.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(root={self.root})"
+
+    @classmethod
+    def from_env(cls) -> Self:
+        return cls(os.environ.get("XTTS_VOICE_DIR", "voices"))
+
+    def path(self, fingerprint: str, *parts: str) -> str:
+        if not FINGERPRINT.match(fingerprint):
+            raise ValueError(f"Invalid voice id: {fingerprint}")
+        return os.path.join(self.root, fingerprint, *parts)
+
+    def get(self, fingerprint: str) -> Optional[VoiceInfo]:
+        try:
+            with open(self.path(fingerprint, "meta.json")) as f:
+                return VoiceInfo(**json.load(f))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def list_voices(self, user: Optional[str] = None) -> list[VoiceInfo]:
+        voices = [
+            voice
+            for voice in (self.get(name) for name in sorted(os.listdir(self.root)))
+            if voice is not None
+        ]
+        if user is not None:
+            voices = [voice for voice in voices if voice.user == user]
+        return voices
+
+    def stage(self, voice: VoiceObject) -> str:
+        """Write the reference audio to a new staging directory and return it."""
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.root)
+        with open(os.path.join(staging, "reference.wav"), "wb") as f:
+            f.write(voice.audio)
+        return staging
+
+    def save(self, voice: VoiceObject, latents: Latents, staging: str) -> VoiceInfo:
+        """Add the latents and meta.json to `staging` and move it into place."""
+        gpt_cond_latent, speaker_embedding = latents
+        np.save(
+            os.path.join(staging, "gpt_cond_latent.npy"),
+            gpt_cond_latent.detach().cpu().numpy(),
+        )
+        np.save(
+            os.path.join(staging, "speaker_embedding.npy"),
+            speaker_embedding.detach().cpu().numpy(),
+        )
+        info = VoiceInfo(
+            id=voice.fingerprint,
+            user=voice.user,
+            size=len(voice.audio),
+            created_at=time.time(),
+        )
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            f.write(info.model_dump_json())
+        path = self.path(voice.fingerprint)
+        try:
+            os.rename(staging, path)
+        except OSError:
+            # A concurrent registration of the same audio got there first.
+            existing = self.get(voice.fingerprint)
+            if existing is not None:
+                self.discard(staging)
+                return existing
+            # Otherwise it is a partial registration written before staging.
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(staging, path)
+        return info
+
+    def discard(self, staging: str) -> None:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    def load(self, fingerprint: str, device: torch.device) -> Optional[Latents]:
+        if self.get(fingerprint) is None:
+            return None
+        # Copy-on-write maps stay backed by the file but are writable for torch.
+        gpt_cond_latent = np.load(
+            self.path(fingerprint, "gpt_cond_latent.npy"), mmap_mode="c"
+        )
+        speaker_embedding = np.load(
+            self.path(fingerprint, "speaker_embedding.npy"), mmap_mode="c"
+        )
+        return (
+            torch.from_numpy(gpt_cond_latent).to(device),
+            torch.from_numpy(speaker_embedding).to(device),
+        )
+
+    def delete(self, fingerprint: str) -> bool:
+        path = self.path(fingerprint)
+        if not os.path.isdir(path):
+            return False
+        shutil.rmtree(path)
+        return True
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncGenerator, Callable, Iterator, Optional, TypeVar
+
+from fastapi import HTTPException, status
+from typing_extensions import ParamSpec, Self
+
+T = TypeVar("T")
+P = ParamSpec("P")
+
+_DONE = object()
+
+
+class InferencePool:
+    """
+    Bounded executor that keeps blocking XTTS inference off the event loop.
+
+    At most `workers` jobs run at once. Requests are admitted once, with
+    `check_capacity`, which rejects them with a 503 while `max_queue` jobs
+    are already waiting for a worker; jobs of an admitted request then only
+    wait for their turn, so a response that has started is never cut short.
+    """
+
+    def __init__(self, *, workers: int = 1, max_queue: int = 32, buffer: int = 8):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.buffer = buffer
+        self.in_flight = 0
+        self.queued = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(workers={self.workers}, max_queue={self.max_queue})"
+
+    @classmethod
+    def from_env(cls) -> Self:
+        return cls(
+            workers=int(os.environ.get("XTTS_WORKERS", "1")),
+            max_queue=int(os.environ.get("XTTS_MAX_QUEUE", "32")),
+            buffer=int(os.environ.get("XTTS_STREAM_BUFFER", "8")),
+        )
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Created on first use; pools that run jobs elsewhere never need one.
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="xtts-inference"
+            )
+        return self._executor
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the server's running loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        return self._semaphore
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+        }
+
+    def check_capacity(self) -> None:
+        if self.queued >= self.max_queue:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Inference queue is full, retry later",
+                headers={"Retry-After": "1"},
+            )
+
+    async def acquire(self) -> None:
+        self.queued += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self.semaphore.release()
+
+    def submit(self, job: Callable[[], T]) -> "asyncio.Future[T]":
+        """
+        Start `job` on a worker once a slot has been acquired. The slot is
+        released from the worker thread when the job returns, not when its
+        future is cancelled, so an abandoned job keeps its slot until the
+        thread is actually free again.
+        """
+        loop = asyncio.get_running_loop()
+
+        def work() -> T:
+            try:
+                return job()
+            finally:
+                try:
+                    loop.call_soon_threadsafe(self.release)
+                except RuntimeError:
+                    # The loop has closed during shutdown.
+                    pass
+
+        try:
+            return loop.run_in_executor(self.executor, work)
+        except BaseException:
+            self.release()
+            raise
+
+    async def run(self, func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        """Run a blocking call on a worker and await its result."""
+        await self.acquire()
+        return await self.submit(partial(func, *args, **kwargs))
+
+    async def broadcast(
+        self, func: Callable[P, T], *args: P.args, **kwargs: P.kwargs
+    ) -> list[T]:
+        """Run a call once on every independent model instance behind the pool."""
+        return [await self.run(func, *args, **kwargs)]
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    async def stream(
+        self, func: Callable[P, Iterator[T]], *args: P.args, **kwargs: P.kwargs
+    ) -> AsyncGenerator[T, None]:
+        """
+        Drive a blocking generator on a worker and relay its items through an
+        asyncio queue. At most `buffer` items are produced ahead of the consumer,
+        and the worker stops as soon as the consumer goes away.
+        """
+        await self.acquire()
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        credits = threading.Semaphore(self.buffer)
+        stop = threading.Event()
+
+        def put(item: Any) -> None:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                stop.set()
+
+        def produce() -> None:
+            try:
+                for item in func(*args, **kwargs):
+                    while not credits.acquire(timeout=0.1):
+                        if stop.is_set():
+                            return
+                    if stop.is_set():
+                        return
+                    put(item)
+            except BaseException as e:
+                put(e)
+            else:
+                put(_DONE)
+
+        self.submit(produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                credits.release()
+                yield item
+        finally:
+            stop.set()
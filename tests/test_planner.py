@@ -0,0 +1,62 @@
+import numpy as np
+
+from speech.cache import SentenceCache
+from speech.planner import ChunkPlanner
+
+SPEAKER = "Claribel Dervla"
+
+
+def synthesize(planner: ChunkPlanner, cache: SentenceCache, sentences: list[str]):
+    """Plan and "synthesize" like XTTS.synthesize_stream, returning cache hits."""
+
+    def key(text: str) -> str:
+        return cache.key(text=text, speaker=SPEAKER, language="en", speed=1.0)
+
+    hits = []
+    for chunk in planner.plan(
+        sentences, language="en", cached=lambda sentence: key(sentence) in cache
+    ):
+        if cache.get(key(chunk)) is not None:
+            hits.append(chunk)
+        else:
+            cache.set(key(chunk), np.zeros(len(chunk), dtype=np.float32))
+    return hits
+
+
+def test_short_sentences_are_packed():
+    planner = ChunkPlanner(target_chars=150)
+    assert planner.plan(["Yes.", "Okay.", "Sure."], language="en") == [
+        "Yes. Okay. Sure."
+    ]
+
+
+def test_repeated_sentence_is_planned_alone():
+    planner = ChunkPlanner(target_chars=150)
+    planner.plan(["Hello there.", "How are you?"], language="en")
+    chunks = planner.plan(["Good morning.", "Hello there.", "Bye."], language="en")
+    assert chunks == ["Good morning.", "Hello there.", "Bye."]
+    assert planner.stats()["repeated_sentences"] == 1
+
+
+def test_repeated_sentence_in_new_long_text_is_a_hit():
+    planner = ChunkPlanner(target_chars=150)
+    cache = SentenceCache(max_bytes=1024 * 1024)
+    greeting = "Thanks for calling, how can I help you today?"
+
+    assert synthesize(planner, cache, [greeting, "Your order has shipped."]) == []
+    # Seen before: synthesized alone, so it is cached as a sentence of its own.
+    assert synthesize(planner, cache, [greeting, "Your refund is on its way."]) == []
+    hits = synthesize(
+        planner,
+        cache,
+        ["Welcome back.", greeting, "Your invoice is attached.", "Anything else?"],
+    )
+    assert hits == [greeting]
+
+
+def test_seen_sentences_are_bounded():
+    planner = ChunkPlanner(max_seen=2)
+    for sentence in ["One.", "Two.", "Three."]:
+        planner.seen(sentence, language="en")
+    assert not planner.seen("One.", language="en")
+    assert planner.seen("Three.", language="en")
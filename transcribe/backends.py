@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import math
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, BinaryIO, Optional, Union
+
+import numpy as np
+from openai import NOT_GIVEN
+from typing_extensions import TypeAlias
+
+from shared.batching import MicroBatcher
+
+from .clients import clients
+from .formats import render
+from .longform import SAMPLE_RATE, load_audio
+from .utils import get_logger
+
+logger = get_logger()
+
+FileTuple: TypeAlias = "tuple[Optional[str], Union[bytes, BinaryIO], Optional[str]]"
+TranscriptionResult: TypeAlias = "Union[str, dict[str, Any]]"
+
+
+class TranscriptionBackend(ABC):
+    """
+    Engine behind the transcription and translation routes.
+
+    Implementations return plain text for the text, srt and vtt formats and a
+    dict for json and verbose_json, matching the OpenAI response shapes.
+    """
+
+    name: str
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}()"
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": self.name}
+
+    @abstractmethod
+    async def transcribe(
+        self,
+        file: FileTuple,
+        *,
+        model: str,
+        language: Optional[str],
+        prompt: Optional[str],
+        response_format: str,
+        temperature: float,
+    ) -> TranscriptionResult:
+        raise NotImplementedError
+
+
+class OpenAIBackend(TranscriptionBackend):
+    """Forwards to the upstream OpenAI-compatible transcription API."""
+
+    name = "openai"
+
+    async def transcribe(
+        self,
+        file: FileTuple,
+        *,
+        model: str,
+        language: Optional[str],
+        prompt: Optional[str],
+        response_format: str,
+        temperature: float,
+    ) -> TranscriptionResult:
+        return await create_transcription(
+            file,
+            model=model,
+            language=language or NOT_GIVEN,
+            prompt=prompt or NOT_GIVEN,
+            response_format=response_format,
+            temperature=temperature,
+        )
+
+
+@clients.resilient()
+async def create_transcription(file: FileTuple, **params: Any) -> TranscriptionResult:
+    _, content, _ = file
+    # Each attempt re-sends the upload from the start.
+    if not isinstance(content, bytes):
+        content.seek(0)
+    async with clients.limit():
+        result = await clients.openai.audio.transcriptions.create(file=file, **params)
+    if isinstance(result, str):
+        return result
+    return json.loads(result.model_dump_json())
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    On-prem Whisper running on CPU through a `transformers` ASR pipeline.
+
+    Pipelines are loaded once per model and reused. Concurrent requests that
+    share language, prompt and temperature are collected for up to `max_wait`
+    seconds and decoded together as one batch of at most `max_batch` inputs.
+
+    Decoding is greedy. As in the OpenAI API, a positive `temperature` is the
+    upper bound of a fallback schedule: a segment is only resampled at
+    increasing temperatures when its greedy output looks degenerate.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        *,
+        model: Optional[str] = None,
+        device: str = "cpu",
+        max_batch: int = 8,
+        max_wait: float = 0.05,
+        chunk_length_s: float = 30.0,
+    ):
+        self.model = model
+        self.device = device
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.chunk_length_s = chunk_length_s
+        self._pipelines: dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.batcher: MicroBatcher[tuple[Any, ...], np.ndarray, dict[str, Any]] = (
+            MicroBatcher(self._run, max_batch=max_batch, max_wait=max_wait)
+        )
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(model={self.model}, device={self.device}, max_batch={self.max_batch})"
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": self.name,
+            "models": list(self._pipelines),
+            "batches": self.batcher.batches,
+            "requests": self.batcher.items,
+            "pending": self.batcher.pending,
+            "max_batch": self.max_batch,
+        }
+
+    def pipeline(self, model: str) -> Any:
+        # Requests name OpenAI models; map them to the Hugging Face checkpoints.
+        checkpoint = self.model or f"openai/{model}"
+        with self._lock:
+            if checkpoint not in self._pipelines:
+                try:
+                    from transformers import pipeline  # type: ignore
+                except ImportError as e:
+                    raise RuntimeError(
+                        "The local transcription backend requires `transformers`"
+                    ) from e
+                logger.info("Loading local Whisper model %s", checkpoint)
+                self._pipelines[checkpoint] = pipeline(
+                    "automatic-speech-recognition", model=checkpoint, device=self.device
+                )
+            return self._pipelines[checkpoint]
+
+    def _run_batch(
+        self,
+        arrays: list[np.ndarray],
+        *,
+        model: str,
+        language: Optional[str],
+        prompt: Optional[str],
+        temperature: float,
+    ) -> list[dict[str, Any]]:
+        pipe = self.pipeline(model)
+        generate_kwargs: dict[str, Any] = {"task": "transcribe"}
+        if language:
+            generate_kwargs["language"] = language
+        if temperature > 0:
+            generate_kwargs.update(
+                temperature=fallback_temperatures(temperature),
+                compression_ratio_threshold=1.35,
+                logprob_threshold=-1.0,
+            )
+        if prompt:
+            generate_kwargs["prompt_ids"] = pipe.tokenizer.get_prompt_ids(
+                prompt, return_tensors="pt"
+            )
+        outputs = pipe(
+            [{"raw": array, "sampling_rate": SAMPLE_RATE} for array in arrays],
+            batch_size=len(arrays),
+            chunk_length_s=self.chunk_length_s,
+            return_timestamps=True,
+            generate_kwargs=generate_kwargs,
+        )
+        results: list[dict[str, Any]] = []
+        for array, output in zip(arrays, outputs):
+            duration = len(array) / SAMPLE_RATE
+            segments = []
+            for chunk in output.get("chunks") or []:
+                start, end = chunk["timestamp"]
+                segments.append(
+                    {
+                        "id": len(segments),
+                        "start": start or 0.0,
+                        "end": end if end is not None else duration,
+                        "text": chunk["text"],
+                    }
+                )
+            results.append(
+                {
+                    "task": "transcribe",
+                    "language": language,
+                    "duration": duration,
+                    "text": output["text"].strip(),
+                    "segments": segments,
+                }
+            )
+        return results
+
+    async def _run(
+        self, key: tuple[Any, ...], arrays: list[np.ndarray]
+    ) -> list[dict[str, Any]]:
+        model, language, prompt, temperature = key
+        return await asyncio.to_thread(
+            self._run_batch,
+            arrays,
+            model=model,
+            language=language,
+            prompt=prompt,
+            temperature=temperature,
+        )
+
+    async def transcribe(
+        self,
+        file: FileTuple,
+        *,
+        model: str,
+        language: Optional[str],
+        prompt: Optional[str],
+        response_format: str,
+        temperature: float,
+    ) -> TranscriptionResult:
+        _, content, _ = file
+        if isinstance(content, bytes):
+            content = io.BytesIO(content)
+        audio = await asyncio.to_thread(load_audio, content)
+        array = np.frombuffer(audio.raw_data, dtype=np.int16).astype(np.float32) / 32768.0
+        result = await self.batcher.submit((model, language, prompt, temperature), array)
+        return render(result, response_format)
+
+
+def fallback_temperatures(temperature: float) -> tuple[float, ...]:
+    """Greedy first, then steps of 0.2 up to `temperature`."""
+    steps = math.ceil(round(temperature / 0.2, 6))
+    return tuple(round(0.2 * i, 1) for i in range(steps)) + (temperature,)
+
+
+def backend_from_env() -> TranscriptionBackend:
+    name = os.environ.get("TRANSCRIBE_BACKEND", "openai")
+    if name == "openai":
+        return OpenAIBackend()
+    if name == "local":
+        return LocalWhisperBackend(
+            model=os.environ.get("TRANSCRIBE_LOCAL_MODEL") or None,
+            device=os.environ.get("TRANSCRIBE_LOCAL_DEVICE", "cpu"),
+            max_batch=int(os.environ.get("TRANSCRIBE_LOCAL_MAX_BATCH", "8")),
+            max_wait=float(os.environ.get("TRANSCRIBE_LOCAL_MAX_WAIT_MS", "50")) / 1000,
+        )
+    raise ValueError(f"Unknown transcription backend: {name}")
+
+
+backend = backend_from_env()
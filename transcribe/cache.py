@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, BinaryIO, cast
+
+from shared.cache import Cache, LRUCache
+from shared.metrics import cache_counts, registry
+
+CHUNK_SIZE = 8192
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+def hash_upload(file: BinaryIO, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    SHA-256 of an upload's content, read in `chunk_size` blocks like
+    `speech.schema.compute_fingerprint` so large spooled files are never
+    loaded into memory at once. Leaves the file positioned at the start.
+    """
+    hasher = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b""):
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
+
+
+def spool_upload(
+    file: BinaryIO, chunk_size: int = CHUNK_SIZE, max_size: int = SPOOL_MAX_SIZE
+) -> tuple[str, BinaryIO]:
+    """
+    Hash an upload and copy it into a private spooled file in the same pass.
+
+    Coalesced computations read the copy rather than the request's upload, so
+    a follower keeps working when the request that started the computation
+    goes away and its upload is closed. The copy is returned at position 0;
+    whoever reads it closes it, and an unused copy is released when dropped.
+    """
+    hasher = hashlib.sha256()
+    copy = cast(BinaryIO, tempfile.SpooledTemporaryFile(max_size=max_size))
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b""):
+        hasher.update(chunk)
+        copy.write(chunk)
+    file.seek(0)
+    copy.seek(0)
+    return hasher.hexdigest(), copy
+
+
+def request_key(digest: str, **params: Any) -> str:
+    """Cache key for `digest` combined with the request parameters that affect the output."""
+    return digest + ":" + json.dumps(params, sort_keys=True, default=str)
+
+
+# Upload results; TRANSCRIBE_CACHE_SIZE=0 disables storage but keeps coalescing.
+results: Cache[str, Any] = Cache(
+    LRUCache(
+        max_weight=int(os.environ.get("TRANSCRIBE_CACHE_SIZE", "1024")),
+        ttl=float(os.environ.get("TRANSCRIBE_CACHE_TTL", "86400")),
+    )
+)
+
+registry.gauge(
+    "transcription_cache_requests_total",
+    "Upload result cache lookups by result.",
+    lambda: cache_counts(results.stats()),
+    ("result",),
+    kind="counter",
+)
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from functools import wraps
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+import httpx
+from openai import AsyncOpenAI
+from typing_extensions import Self
+
+from shared.metrics import registry
+
+from .utils import CircuitBreaker, Hedger, get_logger, handle
+
+logger = get_logger()
+
+# Upstream (OpenAI-compatible API) calls, one observation per attempt.
+upstream_latency = registry.histogram(
+    "upstream_request_seconds",
+    "Latency of upstream API attempts.",
+    ("operation", "outcome"),
+)
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+
+def _flag(name: str, default: str = "false") -> bool:
+    return os.environ.get(name, default).lower() in ("1", "true", "yes")
+
+
+class ClientRegistry:
+    """
+    Process-wide upstream clients, created once in the FastAPI lifespan.
+
+    A single pooled `httpx.AsyncClient` backs the `AsyncOpenAI` client, so TLS
+    sessions and keep-alive connections are reused across requests, and an
+    asyncio semaphore caps how many upstream calls are in flight at once.
+    Point `base_url` at a local stand-in server to test without the real API.
+
+    Upstream calls are wrapped with `resilient`, which retries with jittered
+    backoff and trips a circuit breaker shared by all of them; the SDK's own
+    retries are disabled so attempts do not multiply.
+    """
+
+    def __init__(
+        self,
+        *,
+        base_url: Optional[str] = None,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        timeout: float = 600.0,
+        connect_timeout: float = 10.0,
+        concurrency: int = 64,
+        retries: int = 3,
+        retry_delay: float = 0.5,
+        breaker_failures: int = 5,
+        breaker_reset: float = 30.0,
+        hedge_quantile: Optional[float] = None,
+    ):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.concurrency = concurrency
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.hedge_quantile = hedge_quantile
+        self.breaker = CircuitBreaker(
+            "openai", failure_threshold=breaker_failures, reset_timeout=breaker_reset
+        )
+        self.hedgers: dict[str, Hedger] = {}
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self._http: Optional[httpx.AsyncClient] = None
+        self._openai: Optional[AsyncOpenAI] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(base_url={self.base_url}, max_connections={self.max_connections}, concurrency={self.concurrency})"
+
+    @classmethod
+    def from_env(cls) -> Self:
+        hedge_quantile = os.environ.get("UPSTREAM_HEDGE_QUANTILE")
+        return cls(
+            base_url=os.environ.get("OPENAI_BASE_URL") or None,
+            max_connections=int(os.environ.get("UPSTREAM_MAX_CONNECTIONS", "100")),
+            max_keepalive=int(os.environ.get("UPSTREAM_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.environ.get("UPSTREAM_KEEPALIVE_EXPIRY", "30")),
+            http2=_flag("UPSTREAM_HTTP2"),
+            timeout=float(os.environ.get("UPSTREAM_TIMEOUT", "600")),
+            connect_timeout=float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", "10")),
+            concurrency=int(os.environ.get("UPSTREAM_CONCURRENCY", "64")),
+            retries=int(os.environ.get("UPSTREAM_RETRIES", "3")),
+            retry_delay=float(os.environ.get("UPSTREAM_RETRY_DELAY", "0.5")),
+            breaker_failures=int(os.environ.get("UPSTREAM_BREAKER_FAILURES", "5")),
+            breaker_reset=float(os.environ.get("UPSTREAM_BREAKER_RESET", "30")),
+            hedge_quantile=float(hedge_quantile) if hedge_quantile else None,
+        )
+
+    async def start(self) -> None:
+        if self._http is not None:
+            return
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # type: ignore  # noqa: F401
+            except ImportError:
+                logger.warning("UPSTREAM_HTTP2 is set but h2 is not installed, using HTTP/1.1")
+                http2 = False
+        self._http = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+        )
+        self._openai = AsyncOpenAI(
+            base_url=self.base_url,
+            # A local stand-in does not need a real key.
+            api_key=os.environ.get("OPENAI_API_KEY") or ("stand-in" if self.base_url else None),
+            http_client=self._http,
+            max_retries=0,
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+        self._http = None
+        self._openai = None
+        self._semaphore = None
+
+    @property
+    def openai(self) -> AsyncOpenAI:
+        if self._openai is None:
+            raise RuntimeError("Upstream clients are not started")
+        return self._openai
+
+    @asynccontextmanager
+    async def limit(self) -> AsyncIterator[None]:
+        """Hold one of the `concurrency` upstream slots for the duration of a call."""
+        if self._semaphore is None:
+            raise RuntimeError("Upstream clients are not started")
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.requests += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def resilient(self, *, hedge: bool = False) -> Callable[[F], F]:
+        """
+        Decorate a coroutine function calling upstream with retries and the
+        shared circuit breaker. With `hedge`, and UPSTREAM_HEDGE_QUANTILE set,
+        a second attempt is started when the first runs past that latency
+        quantile; only use it for idempotent calls.
+        """
+
+        def decorator(func: F) -> F:
+            @wraps(func)
+            async def timed(*args: Any, **kwargs: Any) -> Any:
+                start = time.perf_counter()
+                outcome = "error"
+                try:
+                    result = await func(*args, **kwargs)
+                    outcome = "ok"
+                    return result
+                except asyncio.CancelledError:
+                    outcome = "cancelled"
+                    raise
+                finally:
+                    upstream_latency.observe(
+                        time.perf_counter() - start,
+                        operation=func.__name__,
+                        outcome=outcome,
+                    )
+
+            hedger = None
+            if hedge and self.hedge_quantile:
+                hedger = self.hedgers[func.__name__] = Hedger(quantile=self.hedge_quantile)
+            return handle(  # type: ignore
+                timed,
+                retries=self.retries,
+                delay=self.retry_delay,
+                breaker=self.breaker,
+                hedger=hedger,
+            )
+
+        return decorator
+
+    def stats(self) -> dict[str, Any]:
+        stats: dict[str, Any] = {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "concurrency": self.concurrency,
+            "max_connections": self.max_connections,
+            "breaker": self.breaker.stats(),
+        }
+        if self.hedgers:
+            stats["hedging"] = {name: h.stats() for name, h in self.hedgers.items()}
+        # httpcore does not expose pool state publicly; report it when present.
+        pool = getattr(getattr(self._http, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            stats["connections"] = len(connections)
+            stats["idle_connections"] = sum(1 for c in connections if c.is_idle())
+        return stats
+
+
+clients = ClientRegistry.from_env()
+
+registry.gauge(
+    "upstream_in_flight", "Upstream calls holding a concurrency slot.", lambda: clients.in_flight
+)
+registry.gauge(
+    "upstream_waiting", "Upstream calls waiting for a concurrency slot.", lambda: clients.waiting
+)
+registry.gauge(
+    "upstream_circuit_open",
+    "1 while the upstream circuit breaker rejects calls.",
+    lambda: float(clients.breaker.state == "open"),
+)
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from typing import Any, Union
+
+
+def _timestamp(seconds: float, separator: str) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def to_srt(segments: list[dict[str, Any]]) -> str:
+    return "\n".join(
+        f"{i}\n{_timestamp(s['start'], ',')} --> {_timestamp(s['end'], ',')}\n{s['text'].strip()}\n"
+        for i, s in enumerate(segments, start=1)
+    )
+
+
+def to_vtt(segments: list[dict[str, Any]]) -> str:
+    return "WEBVTT\n\n" + "\n".join(
+        f"{_timestamp(s['start'], '.')} --> {_timestamp(s['end'], '.')}\n{s['text'].strip()}\n"
+        for s in segments
+    )
+
+
+def render(merged: dict[str, Any], response_format: str) -> Union[str, dict[str, Any]]:
+    if response_format == "verbose_json":
+        return merged
+    if response_format == "json":
+        return {"text": merged["text"]}
+    if response_format == "text":
+        return merged["text"]
+    if response_format == "srt":
+        return to_srt(merged["segments"])
+    if response_format == "vtt":
+        return to_vtt(merged["segments"])
+    raise ValueError(f"Unsupported response format: {response_format}")
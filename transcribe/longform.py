@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Any, AsyncIterator, BinaryIO, Optional, Union
+
+import numpy as np
+from fastapi import HTTPException
+from pydub import AudioSegment  # type: ignore
+from pydub.exceptions import CouldntDecodeError  # type: ignore
+
+from .formats import render
+
+if TYPE_CHECKING:
+    from .backends import TranscriptionBackend
+
+FRAME_MS = 10
+SAMPLE_RATE = 16000
+
+
+def load_audio(file: BinaryIO, *, max_seconds: Optional[float] = None) -> AudioSegment:
+    """
+    Decode an upload to 16 kHz mono, the input rate Whisper works at.
+
+    ffmpeg resamples while it decodes and its output is appended to one
+    buffer, so only the 16-bit mono result is ever held in memory (32 KB per
+    second, about 58 MB at the default 30 minute cap), and decoding is
+    abandoned with a 413 as soon as it runs past `max_seconds`.
+    """
+    max_seconds = max_seconds or float(os.environ.get("TRANSCRIBE_MAX_SECONDS", "1800"))
+    limit = int(max_seconds * SAMPLE_RATE) * 2
+    file.seek(0)
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(
+            [
+                AudioSegment.converter,
+                "-v",
+                "error",
+                "-i",
+                "pipe:0",
+                "-f",
+                "s16le",
+                "-ac",
+                "1",
+                "-ar",
+                str(SAMPLE_RATE),
+                "pipe:1",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=errors,
+        )
+        assert process.stdin is not None and process.stdout is not None
+
+        def feed() -> None:
+            try:
+                shutil.copyfileobj(file, process.stdin, 1024 * 1024)
+            except OSError:
+                # ffmpeg stopped reading: it failed or the limit was hit.
+                pass
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        data = bytearray()
+        try:
+            while True:
+                chunk = process.stdout.read(1024 * 1024)
+                if not chunk:
+                    break
+                if len(data) + len(chunk) > limit:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Audio is longer than {max_seconds:g} seconds",
+                    )
+                data += chunk
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            process.stdout.close()
+            process.wait()
+            feeder.join()
+        if process.returncode:
+            errors.seek(0)
+            raise CouldntDecodeError(
+                errors.read().decode("utf-8", errors="replace").strip()
+                or f"ffmpeg exited with code {process.returncode}"
+            )
+    # Passed as is: joining or copying would double the peak for long audio.
+    return AudioSegment(data=data, sample_width=2, frame_rate=SAMPLE_RATE, channels=1)
+
+
+def frame_levels(audio: AudioSegment) -> np.ndarray:
+    """dBFS level of each FRAME_MS frame of a 16-bit mono segment."""
+    samples = np.frombuffer(audio.raw_data, dtype=np.int16).astype(np.float32)
+    size = int(audio.frame_rate * FRAME_MS / 1000)
+    count = len(samples) // size
+    frames = samples[: count * size].reshape(count, size) / 32768.0
+    rms = np.sqrt(np.mean(frames**2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def plan_segments(
+    audio: AudioSegment,
+    *,
+    max_seconds: float = 300.0,
+    min_silence_seconds: float = 0.5,
+    silence_thresh_db: float = -40.0,
+) -> list[tuple[int, int]]:
+    """
+    Split `audio` into (start_ms, end_ms) spans of at most `max_seconds`,
+    cutting in the middle of the latest long-enough silence before each limit.
+    Spans are only cut mid-speech when no silence is available.
+    """
+    total = len(audio)
+    limit = int(max_seconds * 1000)
+    if total <= limit:
+        return [(0, total)]
+    silent = frame_levels(audio) < silence_thresh_db
+    min_run = max(1, int(min_silence_seconds * 1000 / FRAME_MS))
+    cuts: list[int] = []
+    run_start: Optional[int] = None
+    for i, is_silent in enumerate(np.append(silent, False)):
+        if is_silent and run_start is None:
+            run_start = i
+        elif not is_silent and run_start is not None:
+            if i - run_start >= min_run:
+                cuts.append((run_start + i) // 2 * FRAME_MS)
+            run_start = None
+    spans: list[tuple[int, int]] = []
+    start = 0
+    while total - start > limit:
+        candidates = [cut for cut in cuts if start < cut <= start + limit]
+        end = candidates[-1] if candidates else start + limit
+        spans.append((start, end))
+        start = end
+    spans.append((start, total))
+    return spans
+
+
+def export_wav(audio: AudioSegment) -> bytes:
+    buffer = io.BytesIO()
+    audio.export(buffer, format="wav")  # type: ignore
+    return buffer.getvalue()
+
+
+def merge_verbose(
+    results: list[dict[str, Any]], offsets: list[float], duration: float
+) -> dict[str, Any]:
+    """Stitch per-span verbose_json results, shifting timestamps by each span's offset."""
+    segments: list[dict[str, Any]] = []
+    words: list[dict[str, Any]] = []
+    for result, offset in zip(results, offsets):
+        for segment in result.get("segments") or []:
+            segments.append(
+                {
+                    **segment,
+                    "id": len(segments),
+                    "start": segment["start"] + offset,
+                    "end": segment["end"] + offset,
+                }
+            )
+        for word in result.get("words") or []:
+            words.append(
+                {**word, "start": word["start"] + offset, "end": word["end"] + offset}
+            )
+    merged: dict[str, Any] = {
+        "task": "transcribe",
+        "language": next((r["language"] for r in results if r.get("language")), None),
+        "duration": duration,
+        "text": " ".join(r.get("text", "").strip() for r in results).strip(),
+        "segments": segments,
+    }
+    if words:
+        merged["words"] = words
+    return merged
+
+
+async def transcribe_spans(
+    audio: AudioSegment,
+    spans: list[tuple[int, int]],
+    backend: TranscriptionBackend,
+    *,
+    model: str,
+    language: Optional[str],
+    prompt: Optional[str],
+    temperature: float,
+    max_parallel: int,
+) -> AsyncIterator[tuple[tuple[int, int], dict[str, Any]]]:
+    """
+    Transcribe `spans` of `audio` concurrently on `backend`, with at most
+    `max_parallel` calls at a time, yielding each span's verbose_json result
+    in span order as soon as it and every earlier span are done.
+    """
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def transcribe_span(start: int, end: int) -> dict[str, Any]:
+        async with semaphore:
+            data = await asyncio.to_thread(export_wav, audio[start:end])
+            result = await backend.transcribe(
+                (f"segment-{start}.wav", data, "audio/wav"),
+                model=model,
+                language=language,
+                prompt=prompt,
+                response_format="verbose_json",
+                temperature=temperature,
+            )
+            assert isinstance(result, dict)
+            return result
+
+    tasks = [asyncio.ensure_future(transcribe_span(s, e)) for s, e in spans]
+    try:
+        for span, task in zip(spans, tasks):
+            yield span, await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def transcribe_long(
+    file: BinaryIO,
+    backend: TranscriptionBackend,
+    *,
+    model: str,
+    language: Optional[str],
+    prompt: Optional[str],
+    response_format: str,
+    temperature: float,
+    max_parallel: Optional[int] = None,
+    segment_seconds: Optional[float] = None,
+) -> Union[str, dict[str, Any]]:
+    """
+    Transcribe long audio by splitting it at silences and transcribing the
+    spans concurrently on `backend`, with at most `max_parallel` calls at a time.
+    Spans are always requested as verbose_json so timestamps can be stitched
+    before rendering the requested format.
+    """
+    max_parallel = max_parallel or int(os.environ.get("TRANSCRIBE_MAX_PARALLEL", "4"))
+    segment_seconds = segment_seconds or float(
+        os.environ.get("TRANSCRIBE_SEGMENT_SECONDS", "300")
+    )
+    audio = await asyncio.to_thread(load_audio, file)
+    spans = await asyncio.to_thread(plan_segments, audio, max_seconds=segment_seconds)
+    results = [
+        result
+        async for _, result in transcribe_spans(
+            audio,
+            spans,
+            backend,
+            model=model,
+            language=language,
+            prompt=prompt,
+            temperature=temperature,
+            max_parallel=max_parallel,
+        )
+    ]
+    merged = merge_verbose(
+        results, [start / 1000 for start, _ in spans], len(audio) / 1000
+    )
+    return render(merged, response_format)
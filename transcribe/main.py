@@ -1,25 +1,27 @@
+import asyncio
 import typing as tp
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile, status
-from httpx import AsyncClient
-from openai import AsyncOpenAI
-from openai._utils._proxy import LazyProxy
 from pydantic import BaseModel, Field
 from typing_extensions import Literal
 
 load_dotenv()
+from .backends import backend
+from .cache import request_key, results, spool_upload
+from .clients import clients
+from .longform import transcribe_long
 from .utils import get_logger
 
 logger = get_logger()
 
 
-def get_client():
-    return AsyncOpenAI()
+app = APIRouter(tags=["audio"], prefix="/audio")
 
 
-app = APIRouter(tags=["audio"], prefix="/audio")
-ai = AsyncOpenAI()
+@app.get("/upstream/stats")
+def upstream_stats():
+    return {**clients.stats(), "backend": backend.stats(), "cache": results.stats()}
 
 
 @app.post("/transcriptions")
@@ -32,17 +34,55 @@ async def transcriptions_handler(
         default="json"
     ),
     temperature: float = Form(default=1.0),
+    long_audio: bool = Form(
+        default=False,
+        description="Split at silences and transcribe the segments in parallel.",
+    ),
 ):
     try:
-        return await get_client().audio.transcriptions.create(
-            file=(file.filename, await file.read(), file.content_type),
+        # The shared computation reads its own copy: this request's upload is
+        # closed when it finishes, even if coalesced requests still wait on it.
+        digest, upload = await asyncio.to_thread(spool_upload, file.file)
+        filename, content_type = file.filename, file.content_type
+        key = request_key(
+            digest,
+            task="transcriptions",
+            backend=backend.name,
             model=model,
             language=language,
             prompt=prompt,
             response_format=response_format,
             temperature=temperature,
+            long_audio=long_audio,
         )
-    except (Exception, HTTPException) as e:
+
+        async def transcribe() -> tp.Union[str, dict[str, tp.Any]]:
+            with upload:
+                if long_audio:
+                    return await transcribe_long(
+                        upload,
+                        backend,
+                        model=model,
+                        language=language,
+                        prompt=prompt,
+                        response_format=response_format,
+                        temperature=temperature,
+                    )
+                # Forward the spooled copy as a file object so the multipart
+                # body is streamed from disk instead of being buffered in memory.
+                return await backend.transcribe(
+                    (filename, upload, content_type),
+                    model=model,
+                    language=language,
+                    prompt=prompt,
+                    response_format=response_format,
+                    temperature=temperature,
+                )
+
+        return await results.aget_or_compute(key, transcribe)
+    except HTTPException:
+        raise
+    except Exception as e:
         logger.error(e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
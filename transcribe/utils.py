@@ -4,15 +4,21 @@ import asyncio
 import base64
 import json
 import logging
+import random
+import threading
 import time
+from collections import deque
 from functools import partial, reduce, wraps
-from typing import Awaitable, Callable, Coroutine, Type, TypeVar, Union, cast
+from typing import Any, Awaitable, Callable, Coroutine, Type, TypeVar, Union, cast
 from uuid import uuid4
 
-from cachetools import TTLCache, cached
+import httpx
 from fastapi import HTTPException
+from openai import APIConnectionError
 from typing_extensions import ParamSpec
 
+from shared.cache import Cache, LRUCache, cached
+
 T = TypeVar("T")
 P = ParamSpec("P")
 
@@ -24,13 +30,17 @@ def chunker(seq: str, size: int):
 def ttl_cache(
     maxsize: int = 128, ttl: int = 3600 * 24 * 7
 ) -> Callable[[Callable[P, T]], Callable[P, T]]:
-    def decorator(func: Callable[P, T]) -> Callable[P, T]:
-        @wraps(func)
-        @cached(cache=TTLCache[str, T](maxsize, ttl))
-        def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
-            return func(*args, **kwargs)
+    """
+    Memoize a sync or async function for `ttl` seconds, keeping at most
+    `maxsize` results. Coroutine results are cached, not coroutine objects.
+
+    :param maxsize: Maximum number of cached results.
+    :param ttl: Time to live of each result in seconds.
+    :return: Decorator.
+    """
 
-        return wrapper
+    def decorator(func: Callable[P, T]) -> Callable[P, T]:
+        return cached(Cache(LRUCache(max_weight=maxsize, ttl=ttl)))(func)
 
     return decorator
 
@@ -78,7 +88,8 @@ def exception_handler(
     func: Callable[P, T]
 ) -> Callable[P, Union[T, Coroutine[None, T, T]]]:
     """
-    Decorator to handle exceptions in a function.
+    Decorator to convert unexpected exceptions to HTTP 500 errors.
+    HTTPExceptions raised by the function pass through unchanged.
 
     :param func: Function to be decorated.
     :return: Decorated function.
@@ -88,6 +99,8 @@ def exception_handler(
     def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
         try:
             return func(*args, **kwargs)
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error("%s: %s", e.__class__.__name__, e)
             raise HTTPException(
@@ -99,6 +112,8 @@ def exception_handler(
         try:
             func_ = cast(Awaitable[T], func(*args, **kwargs))
             return await func_
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error("%s: %s", e.__class__.__name__, e)
             raise HTTPException(
@@ -146,48 +161,121 @@ def timing_handler(
     return wrapper
 
 
+RETRYABLE_STATUS = {408, 409, 425, 429}
+
+
+class CircuitOpenError(HTTPException):
+    """Raised without calling upstream while a circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"Upstream {name} is unavailable, failing fast",
+            headers={"Retry-After": str(max(1, int(retry_after)))},
+        )
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether `error` is worth retrying: transport failures, timeouts and
+    HTTP 408/409/425/429/5xx from upstream or from an inner HTTPException.
+
+    :param error: Exception raised by the call.
+    :return: True if the call may succeed when retried.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(
+        error,
+        (APIConnectionError, httpx.TransportError, asyncio.TimeoutError, TimeoutError),
+    ):
+        return True
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS or status >= 500
+    return False
+
+
+def retry_after(error: BaseException) -> float | None:
+    """Seconds requested by a Retry-After header on an upstream error, if any."""
+    response = getattr(error, "response", None)
+    value = getattr(response, "headers", {}).get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff(attempt: int, delay: float, max_delay: float) -> float:
+    """
+    Full-jitter exponential backoff for the zero-based `attempt`.
+
+    :param attempt: Number of failed attempts so far, minus one.
+    :param delay: Base delay in seconds.
+    :param max_delay: Upper bound of the delay in seconds.
+    :return: Seconds to wait before the next attempt.
+    """
+    return random.uniform(0, min(max_delay, delay * 2**attempt))
+
+
 def retry_handler(
-    func: Callable[P, T], retries: int = 3, delay: int = 1
+    func: Callable[P, T],
+    retries: int = 3,
+    delay: float = 1,
+    max_delay: float = 30,
+    retry_on: Callable[[BaseException], bool] = is_retryable,
 ) -> Callable[P, Union[T, Coroutine[None, T, T]]]:
     """
-    Decorator to retry a function with exponential backoff.
+    Decorator to retry a function with jittered exponential backoff.
+
+    Each call keeps its own attempt count, so backoff never carries over
+    between calls. Errors rejected by `retry_on` are raised immediately, and
+    the last error is raised once `retries` attempts have failed. Coroutine
+    functions sleep with `asyncio.sleep`; sync functions block their thread.
 
     :param func: Function to be decorated.
-    :param retries: Number of retries.
-    :param delay: Delay between retries.
+    :param retries: Maximum number of attempts.
+    :param delay: Base delay between retries.
+    :param max_delay: Maximum delay between retries.
+    :param retry_on: Predicate selecting the errors to retry.
     :return: Decorated function.
     """
 
+    def wait(attempt: int, error: BaseException) -> float:
+        seconds = retry_after(error)
+        if seconds is None:
+            seconds = backoff(attempt, delay, max_delay)
+        logger.warning(
+            "%s failed (%s: %s), retrying in %.2fs",
+            func.__name__,
+            error.__class__.__name__,
+            error,
+            seconds,
+        )
+        return min(seconds, max_delay)
+
     @wraps(func)
     def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
-        nonlocal delay
-        for _ in range(retries):
+        for attempt in range(retries):
             try:
                 return func(*args, **kwargs)
-            except HTTPException as e:
-                logger.error("%s: %s", e.__class__.__name__, e)
-                time.sleep(delay)
-                delay *= 2
-                continue
-        raise HTTPException(
-            status_code=500, detail=f"Exhausted retries after {retries} attempts"
-        )
+            except Exception as e:
+                if attempt == retries - 1 or not retry_on(e):
+                    raise
+                time.sleep(wait(attempt, e))
+        raise RuntimeError("retries must be at least 1")
 
     @wraps(func)
     async def awrapper(*args: P.args, **kwargs: P.kwargs) -> T:
-        nonlocal delay
-        for _ in range(retries):
+        for attempt in range(retries):
             try:
                 func_ = cast(Awaitable[T], func(*args, **kwargs))
                 return await func_
-            except HTTPException as e:
-                logger.error("%s: %s", e.__class__.__name__, e)
-                await asyncio.sleep(delay)
-                delay *= 2
-        raise HTTPException(
-            status_code=500,
-            detail="Exhausted retries",
-        )
+            except Exception as e:
+                if attempt == retries - 1 or not retry_on(e):
+                    raise
+                await asyncio.sleep(wait(attempt, e))
+        raise RuntimeError("retries must be at least 1")
 
     if asyncio.iscoroutinefunction(func):
         awrapper.__name__ = func.__name__
@@ -196,21 +284,255 @@ def retry_handler(
     return wrapper
 
 
+class CircuitBreaker:
+    """
+    Fails fast while an upstream is down.
+
+    After `failure_threshold` consecutive retryable failures the circuit
+    opens and calls raise `CircuitOpenError` without reaching upstream. Once
+    `reset_timeout` seconds have passed, one trial call is let through: its
+    success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(
+        self, name: str, *, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self.opened_at: float | None = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(name={self.name}, state={self.state})"
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial:
+                self._trial = True
+                return
+            self.rejected += 1
+            assert self.opened_at is not None
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            raise CircuitOpenError(self.name, remaining)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def abandon(self) -> None:
+        """Forget a cancelled trial call so another one can be let through."""
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._trial:
+                    self.opened += 1
+                self.opened_at = time.monotonic()
+                self._trial = False
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+def breaker_handler(
+    func: Callable[P, T], breaker: CircuitBreaker
+) -> Callable[P, Union[T, Coroutine[None, T, T]]]:
+    """
+    Decorator to guard a function with a circuit breaker. Only retryable
+    errors count as failures; any other outcome shows upstream is alive.
+
+    :param func: Function to be decorated.
+    :param breaker: Breaker shared by every call to the same upstream.
+    :return: Decorated function.
+    """
+
+    def record(error: BaseException | None) -> None:
+        if error is not None and is_retryable(error):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    @wraps(func)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        breaker.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            record(e)
+            raise
+        record(None)
+        return result
+
+    @wraps(func)
+    async def awrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        breaker.before_call()
+        try:
+            result = await cast(Awaitable[T], func(*args, **kwargs))
+        except asyncio.CancelledError:
+            breaker.abandon()
+            raise
+        except Exception as e:
+            record(e)
+            raise
+        record(None)
+        return result
+
+    if asyncio.iscoroutinefunction(func):
+        awrapper.__name__ = func.__name__
+        return awrapper
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+
+class Hedger:
+    """
+    Tracks the latency of recent successful calls and decides when to hedge:
+    a second attempt is started once the first has run longer than the
+    `quantile` of that window, and whichever finishes first wins.
+    """
+
+    def __init__(self, *, quantile: float = 0.95, min_samples: int = 20, window: int = 256):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(quantile={self.quantile}, samples={len(self.latencies)})"
+
+    def threshold(self) -> float | None:
+        if len(self.latencies) < self.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "threshold": self.threshold(),
+        }
+
+
+def hedge_handler(
+    func: Callable[P, Awaitable[T]], hedger: Hedger
+) -> Callable[P, Coroutine[None, T, T]]:
+    """
+    Decorator to hedge a coroutine function. Only use it for idempotent
+    calls whose arguments can be sent twice concurrently.
+
+    :param func: Coroutine function to be decorated.
+    :param hedger: Latency tracker deciding when to send the second attempt.
+    :return: Decorated function.
+    """
+
+    @wraps(func)
+    async def awrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        async def attempt() -> T:
+            start = time.monotonic()
+            result = await func(*args, **kwargs)
+            hedger.latencies.append(time.monotonic() - start)
+            return result
+
+        hedger.calls += 1
+        first = asyncio.ensure_future(attempt())
+        threshold = hedger.threshold()
+        if threshold is None:
+            return await first
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=threshold)
+            if not done:
+                hedger.hedged += 1
+                pending.add(asyncio.ensure_future(attempt()))
+            error: BaseException | None = None
+            while pending or done:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            hedger.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+            assert error is not None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    return awrapper
+
+
 def handle(
-    func: Callable[P, T], retries: int = 3, delay: int = 1
+    func: Callable[P, T],
+    retries: int = 3,
+    delay: float = 1,
+    *,
+    max_delay: float = 30,
+    breaker: CircuitBreaker | None = None,
+    hedger: Hedger | None = None,
 ) -> Callable[P, Union[T, Coroutine[None, T, T]]]:
     """
-    Decorator to retry a function with exponential backoff and handle exceptions.
+    Decorator to make an upstream call resilient and handle exceptions.
+
+    From the inside out: optional hedging, an optional circuit breaker
+    checked on every attempt, jittered retries, timing, and conversion of
+    unexpected errors to HTTP 500.
 
     :param func: Function to be decorated.
-    :param retries: Number of retries.
-    :param delay: Delay between retries.
+    :param retries: Maximum number of attempts.
+    :param delay: Base delay between retries.
+    :param max_delay: Maximum delay between retries.
+    :param breaker: Circuit breaker shared by calls to the same upstream.
+    :param hedger: Hedger for idempotent coroutine functions.
     :return: Decorated function.
     """
-    eb = partial(retry_handler, retries=retries, delay=delay)
+    stack: list[Callable[..., Any]] = []
+    if hedger is not None and asyncio.iscoroutinefunction(func):
+        stack.append(partial(hedge_handler, hedger=hedger))
+    if breaker is not None:
+        stack.append(partial(breaker_handler, breaker=breaker))
+    stack += [
+        partial(retry_handler, retries=retries, delay=delay, max_delay=max_delay),
+        timing_handler,
+        exception_handler,
+    ]
     return cast(
         Callable[P, Union[T, Coroutine[None, T, T]]],
-        reduce(lambda f, g: g(f), [exception_handler, timing_handler, eb], func),  # type: ignore
+        reduce(lambda f, g: g(f), stack, func),  # type: ignore
     )
 
 
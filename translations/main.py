@@ -1,20 +1,25 @@
+import asyncio
 import json
-from typing import Any, Dict, Optional, Union
+import os
+from typing import Any, AsyncIterator, BinaryIO, Dict, Optional, Union
 
 from fastapi import APIRouter, File, Form, HTTPException, UploadFile, status
-from httpx import AsyncClient
-from openai import AsyncOpenAI
-from openai.types.audio import Transcription
+from fastapi.responses import StreamingResponse
 from openai.types.chat import ChatCompletion
 from pydantic import BaseModel, Field
 from typing_extensions import Literal
 
+from shared.metrics import cache_counts, registry
+from transcribe.backends import backend
+from transcribe.cache import request_key, results, spool_upload
+from transcribe.clients import clients
+from transcribe.longform import load_audio, plan_segments, transcribe_spans
+
+from .memory import TranslationMemory
+
 # Router configuration
 app = APIRouter(tags=["translations"], prefix="/audio")
 
-# Initialize OpenAI client
-ai = AsyncOpenAI()
-
 
 class TranslationResponse(BaseModel):
     """Response model for translation endpoint"""
@@ -24,6 +29,17 @@ class TranslationResponse(BaseModel):
     source_text: str = Field(..., description="Original transcribed text")
 
 
+class TranslationSegment(BaseModel):
+    """One translated segment of a streaming translation"""
+
+    index: int = Field(..., description="Position of the segment in the audio")
+    start: float = Field(..., description="Segment start in seconds")
+    end: float = Field(..., description="Segment end in seconds")
+    content: str = Field(..., description="The translated text")
+    source_language: Optional[str] = Field(None, description="Detected source language")
+    source_text: str = Field(..., description="Original transcribed text")
+
+
 class AudioTranslationError(Exception):
     """Custom exception for audio translation errors"""
 
@@ -34,31 +50,30 @@ class AudioTranslationError(Exception):
 
 
 async def transcribe_audio(
-    file: UploadFile,
+    file: tuple[Optional[str], BinaryIO, Optional[str]],
     model: str,
     prompt: Optional[str],
     response_format: str,
     temperature: float,
 ) -> str:
-    """Transcribe audio file using OpenAI's Whisper API"""
+    """Transcribe audio file with the configured transcription backend"""
     try:
-        file_content = await file.read()
-        transcription: Transcription = await ai.audio.transcriptions.create(
-            file=(file.filename, file_content, file.content_type),
+        # Stream the spooled file instead of reading it into memory.
+        file[1].seek(0)
+        transcription = await backend.transcribe(
+            file,
             model=model,
+            language=None,
             prompt=prompt,
             response_format=response_format,
             temperature=temperature,
         )
 
         # Handle different response formats
-        if response_format == "json":
-            return json.loads(transcription.model_dump_json())["text"]
+        if response_format in ("json", "verbose_json"):
+            return transcription["text"]
         elif response_format == "text":
             return str(transcription)
-        elif response_format == "verbose_json":
-            response_data = json.loads(transcription.model_dump_json())
-            return response_data["text"]
         else:
             raise AudioTranslationError(
                 f"Unsupported response format: {response_format}"
@@ -67,39 +82,115 @@ async def transcribe_audio(
     except Exception as e:
         raise AudioTranslationError("Failed to transcribe audio", {"error": str(e)})
     finally:
-        await file.seek(0)  # Reset file pointer
+        file[1].seek(0)  # Reset file pointer
 
 
-async def translate_text(text: str) -> tuple[str, str]:
-    """Translate text to English and detect source language"""
-    try:
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a translation bot. Detect the language and translate the text to English. "
-                    "Respond in JSON format with two fields: "
-                    "'translation' (the English translation) and "
-                    "'source_language' (the detected source language). "
-                    "Example: {'translation': 'Hello world', 'source_language': 'Spanish'}"
-                ),
-            },
-            {"role": "user", "content": text},
-        ]
+TRANSLATION_MODEL = "llama-3.2-90b-text-preview"
+
 
-        response: ChatCompletion = await ai.chat.completions.create(
-            model="llama-3.2-90b-text-preview",
+@clients.resilient(hedge=True)
+async def complete_json(messages: list[dict[str, str]]) -> str:
+    """Run a JSON-mode chat completion and return its content"""
+    async with clients.limit():
+        response: ChatCompletion = await clients.openai.chat.completions.create(
+            model=TRANSLATION_MODEL,
             messages=messages,
             response_format={"type": "json_object"},
         )
+    return response.choices[0].message.content
+
 
-        result = json.loads(response.choices[0].message.content)
-        return result["translation"], result["source_language"]
+async def translate_one(text: str, target: str = "English") -> tuple[str, str]:
+    """Translate one text to `target` with its own chat completion"""
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                f"You are a translation bot. Detect the language and translate the text to {target}. "
+                "Respond in JSON format with two fields: "
+                f"'translation' (the {target} translation) and "
+                "'source_language' (the detected source language). "
+                "Example: {'translation': 'Hello world', 'source_language': 'Spanish'}"
+            ),
+        },
+        {"role": "user", "content": text},
+    ]
 
+    result = json.loads(await complete_json(messages))
+    return result["translation"], result["source_language"]
+
+
+async def translate_batch(
+    sentences: list[str], target: str = "English"
+) -> list[tuple[str, str]]:
+    """
+    Translate several sentences to `target` in one structured JSON request,
+    falling back to one request per sentence if the reply does not match
+    """
+    if len(sentences) == 1:
+        return [await translate_one(sentences[0], target)]
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                "You are a translation bot. You receive a JSON array of objects with "
+                "'id' and 'text'. For each one, detect the language and translate the "
+                f"text to {target}. Respond in JSON format with one field, 'translations': "
+                "an array with one object per input, in the same order, with fields "
+                f"'id', 'translation' (the {target} translation) and "
+                "'source_language' (the detected source language). "
+                "Example: {'translations': [{'id': 0, 'translation': 'Hello world', "
+                "'source_language': 'Spanish'}]}"
+            ),
+        },
+        {
+            "role": "user",
+            "content": json.dumps(
+                [{"id": i, "text": text} for i, text in enumerate(sentences)],
+                ensure_ascii=False,
+            ),
+        },
+    ]
+    content = await complete_json(messages)
+    try:
+        items = json.loads(content)["translations"]
+        by_id = {int(item["id"]): item for item in items}
+        return [
+            (by_id[i]["translation"], by_id[i]["source_language"])
+            for i in range(len(sentences))
+        ]
+    except (KeyError, TypeError, ValueError):
+        return list(
+            await asyncio.gather(*(translate_one(s, target) for s in sentences))
+        )
+
+
+memory = TranslationMemory.from_env(translate_batch)
+
+registry.gauge(
+    "translation_memory_requests_total",
+    "Translation memory sentence lookups by result.",
+    lambda: cache_counts(memory.cache.stats()),
+    ("result",),
+    kind="counter",
+)
+
+
+async def translate_text(
+    text: str, target: str = "English", language: Optional[str] = None
+) -> tuple[str, str]:
+    """Translate text to `target` (English by default) and detect source language"""
+    try:
+        return await memory.translate(text, target, language=language)
     except Exception as e:
         raise AudioTranslationError("Failed to translate text", {"error": str(e)})
 
 
+@app.get("/translations/stats")
+def translation_stats():
+    return memory.stats()
+
+
 @app.post(
     "/translations",
     response_model=TranslationResponse,
@@ -139,24 +230,43 @@ async def translate_audio(
                 detail="File must be an audio file",
             )
 
-        # Step 1: Transcribe
-        transcription = await transcribe_audio(
-            file=file,
+        # The shared computation reads its own copy: this request's upload is
+        # closed when it finishes, even if coalesced requests still wait on it.
+        digest, upload = await asyncio.to_thread(spool_upload, file.file)
+        filename, content_type = file.filename, file.content_type
+
+        async def translate() -> TranslationResponse:
+            # Step 1: Transcribe
+            with upload:
+                transcription = await transcribe_audio(
+                    file=(filename, upload, content_type),
+                    model=model,
+                    prompt=prompt,
+                    response_format=response_format,
+                    temperature=temperature,
+                )
+
+            # Step 2: Translate
+            translation, source_language = await translate_text(transcription)
+
+            # Step 3: Return response
+            return TranslationResponse(
+                content=translation,
+                source_language=source_language,
+                source_text=transcription,
+            )
+
+        # Identical uploads share one cached or in-flight result.
+        key = request_key(
+            digest,
+            task="translations",
+            backend=backend.name,
             model=model,
             prompt=prompt,
             response_format=response_format,
             temperature=temperature,
         )
-
-        # Step 2: Translate
-        translation, source_language = await translate_text(transcription)
-
-        # Step 3: Return response
-        return TranslationResponse(
-            content=translation,
-            source_language=source_language,
-            source_text=transcription,
-        )
+        return await results.aget_or_compute(key, translate)
 
     except AudioTranslationError as e:
         raise HTTPException(
@@ -172,3 +282,156 @@ async def translate_audio(
         )
     finally:
         await file.close()
+
+
+async def translate_segments(
+    audio: Any,
+    spans: list[tuple[int, int]],
+    model: str,
+    prompt: Optional[str],
+    temperature: float,
+    max_parallel: int,
+    target: str = "English",
+) -> AsyncIterator[TranslationSegment]:
+    """
+    Translate each transcribed span as soon as it is ready, so translation of
+    early spans overlaps transcription of later ones, and yield them in order
+    """
+    queue: "asyncio.Queue[Optional[asyncio.Task[TranslationSegment]]]" = asyncio.Queue()
+
+    async def translate_span(
+        index: int, span: tuple[int, int], text: str, language: Optional[str]
+    ) -> TranslationSegment:
+        translation, source_language = (
+            await translate_text(text, target, language) if text else ("", None)
+        )
+        return TranslationSegment(
+            index=index,
+            start=span[0] / 1000,
+            end=span[1] / 1000,
+            content=translation,
+            source_language=source_language,
+            source_text=text,
+        )
+
+    async def produce() -> None:
+        try:
+            index = 0
+            async for span, result in transcribe_spans(
+                audio,
+                spans,
+                backend,
+                model=model,
+                language=None,
+                prompt=prompt,
+                temperature=temperature,
+                max_parallel=max_parallel,
+            ):
+                text = result.get("text", "").strip()
+                await queue.put(
+                    asyncio.ensure_future(
+                        translate_span(index, span, text, result.get("language"))
+                    )
+                )
+                index += 1
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.ensure_future(produce())
+    pending: list[asyncio.Task[TranslationSegment]] = []
+    try:
+        while True:
+            task = await queue.get()
+            if task is None:
+                break
+            pending.append(task)
+            yield await task
+            pending.remove(task)
+        # Surface transcription errors raised after the last segment.
+        await producer
+    finally:
+        producer.cancel()
+        for task in pending:
+            task.cancel()
+
+
+@app.post("/translations/stream")
+async def translate_audio_stream(
+    file: UploadFile = File(..., description="Audio file to translate"),
+    model: Literal["whisper-large-v3"] = Form(
+        default="whisper-large-v3", description="Whisper model to use"
+    ),
+    prompt: Optional[str] = Form(
+        default=None, description="Optional prompt for transcription"
+    ),
+    temperature: float = Form(
+        default=0.0, ge=0.0, le=1.0, description="Sampling temperature"
+    ),
+    stream_format: Literal["ndjson", "sse"] = Form(
+        default="ndjson", description="Newline-delimited JSON or server-sent events"
+    ),
+    segment_seconds: float = Form(
+        default=float(os.environ.get("TRANSLATE_SEGMENT_SECONDS", "30")),
+        ge=5.0,
+        le=300.0,
+        description="Maximum segment length, split at silences",
+    ),
+) -> StreamingResponse:
+    """
+    Translate audio file to English text, streaming segments as they finish.
+
+    1. Splits the audio at silences into segments of at most `segment_seconds`
+    2. Transcribes the segments concurrently
+    3. Translates each segment as soon as its transcription is ready
+    4. Streams TranslationSegment objects in order as NDJSON or SSE
+    """
+    try:
+        if not file.content_type.startswith(("audio/", "video/")):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File must be an audio file",
+            )
+        # Decode up front: the upload is closed once the response starts.
+        audio = await asyncio.to_thread(load_audio, file.file)
+        spans = await asyncio.to_thread(
+            plan_segments, audio, max_seconds=segment_seconds
+        )
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Could not decode audio: {str(e)}",
+        )
+    finally:
+        await file.close()
+
+    max_parallel = int(os.environ.get("TRANSCRIBE_MAX_PARALLEL", "4"))
+
+    def frame(payload: str, event: Optional[str] = None) -> str:
+        if stream_format == "sse":
+            return (f"event: {event}\n" if event else "") + f"data: {payload}\n\n"
+        return payload + "\n"
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for segment in translate_segments(
+                audio, spans, model, prompt, temperature, max_parallel
+            ):
+                yield frame(segment.model_dump_json())
+        except AudioTranslationError as e:
+            yield frame(
+                json.dumps({"message": e.message, "details": e.details}), "error"
+            )
+            return
+        except Exception as e:
+            yield frame(json.dumps({"message": str(e)}), "error")
+            return
+        if stream_format == "sse":
+            yield frame("[DONE]", "done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if stream_format == "sse" else "application/x-ndjson",
+        headers={"X-Segment-Count": str(len(spans))},
+    )
@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Any, Awaitable, Callable, Optional
+
+from typing_extensions import Self
+
+from shared.batching import MicroBatcher
+from shared.cache import Cache, CacheBackend, LRUCache
+from shared.segment import SentenceSegmenter, language_code
+
+Translation = tuple[str, str]
+BatchTranslator = Callable[[list[str], str], Awaitable[list[Translation]]]
+
+
+def sentence_key(sentence: str, target: str = "English") -> str:
+    normalized = " ".join(unicodedata.normalize("NFKC", sentence).split())
+    return hashlib.sha256(f"{target}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class TranslationStore(CacheBackend[str, Translation]):
+    """
+    SQLite file holding translations that survive restarts.
+
+    Entries expire `ttl` seconds after being written, and at most
+    `max_entries` of the newest are kept. Both are enforced on open and
+    every `prune_every` writes.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        prune_every: int = 256,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS memory "
+            "(key TEXT PRIMARY KEY, translation TEXT NOT NULL, source_language TEXT NOT NULL)"
+        )
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(memory)")]
+        if "created_at" not in columns:
+            # Stores from before expiry start their clock now.
+            self._db.execute(
+                "ALTER TABLE memory ADD COLUMN created_at REAL NOT NULL DEFAULT 0"
+            )
+            self._db.execute("UPDATE memory SET created_at = ?", (time.time(),))
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS memory_created_at ON memory (created_at)"
+        )
+        self._db.commit()
+        self.prune()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(path={self.path}, ttl={self.ttl}, max_entries={self.max_entries})"
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl if self.ttl else 0.0
+
+    def get(self, key: str) -> Optional[Translation]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT translation, source_language FROM memory "
+                "WHERE key = ? AND created_at >= ?",
+                (key, self._cutoff()),
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key: str, value: Translation) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO memory "
+                "(key, translation, source_language, created_at) VALUES (?, ?, ?, ?)",
+                (key, *value, time.time()),
+            )
+            self._db.commit()
+            self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def pop(self, key: str) -> Optional[Translation]:
+        value = self.get(key)
+        with self._lock:
+            self._db.execute("DELETE FROM memory WHERE key = ?", (key,))
+            self._db.commit()
+        return value
+
+    def prune(self) -> None:
+        """Delete expired entries, then the oldest beyond `max_entries`."""
+        with self._lock:
+            removed = self._db.execute(
+                "DELETE FROM memory WHERE created_at < ?", (self._cutoff(),)
+            ).rowcount
+            if self.max_entries is not None:
+                removed += self._db.execute(
+                    "DELETE FROM memory WHERE key IN (SELECT key FROM memory "
+                    "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                ).rowcount
+            self._db.commit()
+            self.evictions += removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+        }
+
+
+class TranslationMemory:
+    """
+    Sentence-level translation memory in front of the LLM.
+
+    Texts are split into sentences with `SentenceSegmenter`, each keyed by
+    the hash of its normalized form and the target language. Hits come from a
+    bounded LRU, then from the optional SQLite store, which expires entries
+    after `store_ttl` seconds and keeps at most `store_max_entries`. Misses
+    from all concurrent requests are collected for up to `max_wait` seconds
+    and sent to `translate_batch` together, one call per target language
+    with at most `max_batch` sentences; identical pending sentences are
+    translated once.
+    """
+
+    def __init__(
+        self,
+        translate_batch: BatchTranslator,
+        *,
+        max_entries: int = 10000,
+        path: Optional[str] = None,
+        store_ttl: Optional[float] = 3600 * 24 * 30,
+        store_max_entries: Optional[int] = 1_000_000,
+        max_batch: int = 32,
+        max_wait: float = 0.02,
+    ):
+        self.translate_batch = translate_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.segmenter = SentenceSegmenter()
+        self.cache: Cache[str, Translation] = Cache(
+            LRUCache(max_weight=max_entries),
+            TranslationStore(path, ttl=store_ttl, max_entries=store_max_entries)
+            if path
+            else None,
+        )
+        self.batcher: MicroBatcher[str, tuple[str, str], Translation] = MicroBatcher(
+            self._run, max_batch=max_batch, max_wait=max_wait
+        )
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(cache={self.cache!r}, max_batch={self.max_batch})"
+
+    @classmethod
+    def from_env(cls, translate_batch: BatchTranslator) -> Self:
+        return cls(
+            translate_batch,
+            max_entries=int(os.environ.get("TRANSLATION_MEMORY_SIZE", "10000")),
+            path=os.environ.get("TRANSLATION_MEMORY_PATH") or None,
+            store_ttl=float(
+                os.environ.get("TRANSLATION_MEMORY_TTL", str(3600 * 24 * 30))
+            ),
+            store_max_entries=int(
+                os.environ.get("TRANSLATION_MEMORY_STORE_SIZE", "1000000")
+            ),
+            max_batch=int(os.environ.get("TRANSLATION_MAX_BATCH", "32")),
+            max_wait=float(os.environ.get("TRANSLATION_MAX_WAIT_MS", "20")) / 1000,
+        )
+
+    async def _run(
+        self, target: str, items: list[tuple[str, str]]
+    ) -> list[Translation]:
+        results = await self.translate_batch([sentence for _, sentence in items], target)
+        for (key, _), result in zip(items, results):
+            await self.cache.aset(key, result)
+        return results
+
+    async def translate(
+        self, text: str, target: str = "English", *, language: Optional[str] = None
+    ) -> Translation:
+        """
+        Translate `text` to `target` sentence by sentence; returns
+        (translation, source_language). `language` is the source language
+        when known, as a code or Whisper language name, and selects the
+        segmentation rules.
+        """
+        sentences = await asyncio.to_thread(
+            lambda: list(
+                self.segmenter.split(text=text, language=language_code(language))
+            )
+        )
+        if not sentences:
+            return "", ""
+        results: list[Any] = []
+        for sentence in sentences:
+            key = sentence_key(sentence, target)
+            found = await self.cache.aget(key)
+            results.append(
+                found
+                if found is not None
+                else self.batcher.submit(target, (key, sentence), dedupe=key)
+            )
+        # Pending sentences are shared with other requests, so leaving must
+        # not cancel them.
+        resolved: list[Translation] = [
+            await asyncio.shield(r) if isinstance(r, asyncio.Future) else r
+            for r in results
+        ]
+        language = Counter(lang for _, lang in resolved).most_common(1)[0][0]
+        return " ".join(t for t, _ in resolved), language
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.cache.stats(),
+            "batches": self.batcher.batches,
+            "pending": self.batcher.pending,
+        }